@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Ponto de entrada único do projeto:
+
+    python src/abr.py simulate --algorithm bb --trace norway_bus_1
+    python src/abr.py sweep --workers 8
+    python src/abr.py metrics --no-figures
+    python src/abr.py plot
+    python src/abr.py ingest baseline
+    python src/abr.py diff baseline candidate
+
+Os caminhos partem de --root (padrão: $ABR_ROOT ou /app) e podem ser
+trocados individualmente. Os módulos pesados (NumPy, pandas, matplotlib)
+só são importados pelo subcomando que precisa deles.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+DEFAULT_ROOT = os.environ.get("ABR_ROOT", "/app")
+ALGORITHMS = ["bb", "stallion"]
+
+
+def _paths(args):
+    """Resolve os caminhos a partir de --root e das opções específicas."""
+    root = args.root
+    return {
+        "traces": os.path.join(args.traces or os.path.join(root, "traces"), ""),
+        "video_sizes": args.video_sizes or os.path.join(root, "envivio", "video_size_"),
+        "results": args.results or os.path.join(root, "results"),
+        "graphs": args.graphs or os.path.join(root, "graphs"),
+    }
+
+
+def _log_folders(results, algorithms):
+    return {alg: os.path.join(results, f"results_{alg}") for alg in algorithms}
+
+
+def _selection_item(item):
+    """"max_p10=1.0" -> ("max_p10", 1.0), validado contra os filtros do trace_index."""
+    from trace_index import STAT_FIELDS
+
+    key, sep, value = item.partition("=")
+    kind, _, field = key.partition("_")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"esperado FILTRO=VALOR, recebido '{item}'")
+    if kind not in ("min", "max") or field not in STAT_FIELDS:
+        raise argparse.ArgumentTypeError(
+            f"filtro desconhecido '{key}' (use min_/max_ + {', '.join(STAT_FIELDS)})")
+    try:
+        return key, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor inválido em '{item}'")
+
+
+def _parse_selection(items):
+    """[("max_p10", 1.0), ...] -> {"max_p10": 1.0, ...} (filtros do trace_index)."""
+    if not items:
+        return None
+    return dict(items)
+
+
+def cmd_simulate(args):
+    import player
+
+    paths = _paths(args)
+    player.main(traces_folder=paths["traces"],
+                log_folders=_log_folders(paths["results"], args.algorithm),
+                video_size_file=paths["video_sizes"],
+                file_names=args.trace,
+                ledger_path=None,
+                workers=args.workers)
+
+
+def _ingest(paths, run_id, note="", algorithms=ALGORITHMS, file_names=None, replications=None):
+    """
+    Registra logs como o run run_id. A config de cada log vem do ledger
+    (a que de fato o gerou); logs fora do ledger (p.ex. do simulate) usam
+    a config atual do player.
+
+    :param file_names: se informado (sweep), registra só os jobs do ledger
+                       com esses traces e replicação < replications.
+    """
+    import player
+    from ledger import JobLedger
+    from results_store import ResultsStore, log_sessions
+
+    ledger_path = os.path.join(paths["results"], "ledger.sqlite")
+    ledger = JobLedger(ledger_path) if os.path.exists(ledger_path) else None
+    store = ResultsStore(os.path.join(paths["results"], "results.sqlite"))
+    try:
+        for algorithm, log_folder in _log_folders(paths["results"], algorithms).items():
+            if file_names is not None:
+                sessions = ledger.sessions(algorithm, file_names, replications)
+            elif os.path.isdir(log_folder):
+                recorded = {}
+                if ledger is not None:
+                    recorded = {log_path: config for config, _, _, log_path in ledger.sessions(algorithm)}
+                default_config = player.config_key(player.ALGORITHM_CONFIGS[algorithm])
+                sessions = [(recorded.get(os.path.abspath(log_path), default_config), trace, replication, log_path)
+                            for trace, replication, log_path in log_sessions(log_folder)]
+            else:
+                continue
+            n = store.ingest_sessions(run_id, algorithm, sessions, note)
+            print(f"{algorithm}: {n} sessões registradas no run '{run_id}'")
+    finally:
+        store.close()
+        if ledger is not None:
+            ledger.close()
+
+
+def cmd_sweep(args):
+    import player
+
+    paths = _paths(args)
+    file_names = player.main(traces_folder=paths["traces"],
+                             log_folders=_log_folders(paths["results"], args.algorithm),
+                             video_size_file=paths["video_sizes"],
+                             trace_selection=_parse_selection(args.select),
+                             trace_index=os.path.join(paths["results"], "trace_index.csv"),
+                             ledger_path=os.path.join(paths["results"], "ledger.sqlite"),
+                             replications=args.replications,
+                             workers=args.workers)
+    if args.run_id and file_names:
+        # Só o que esta varredura cobriu: algoritmos, traces e replicações
+        _ingest(paths, args.run_id, args.note, args.algorithm, file_names, args.replications)
+
+
+def cmd_metrics(args):
+    import compute_metrics
+
+    paths = _paths(args)
+    log_folders = _log_folders(paths["results"], ALGORITHMS)
+    compute_metrics.main(export_figures=not args.no_figures,
+                         workers=args.workers,
+                         bb_log_folder=log_folders["bb"],
+                         stallion_log_folder=log_folders["stallion"],
+                         graphs_dir=os.path.join(paths["graphs"], "graphs_comparative"),
+                         csv_output_path=os.path.join(paths["results"], "family_comparison.csv"),
+                         tail_csv_output_path=os.path.join(paths["results"], "family_tail_metrics.csv"))
+
+
+def cmd_plot(args):
+    import plot_logs
+
+    paths = _paths(args)
+    plot_logs.main(results_dirs=_log_folders(paths["results"], ALGORITHMS),
+                   comparative_dir=os.path.join(paths["graphs"], "graphs_comparative"),
+                   family_dir=os.path.join(paths["graphs"], "graphs_families"),
+                   trace_dir=os.path.join(paths["graphs"], "graphs_traces"),
+                   workers=args.workers)
+
+
+def cmd_ingest(args):
+    _ingest(_paths(args), args.run_id, args.note)
+
+
+def cmd_runs(args):
+    from results_store import ResultsStore
+
+    store = ResultsStore(os.path.join(_paths(args)["results"], "results.sqlite"))
+    try:
+        for run in store.runs():
+            print(f"{run['run_id']}\t{time.strftime('%Y-%m-%d %H:%M', time.localtime(run['created_at']))}"
+                  f"\t{run['note']}")
+    finally:
+        store.close()
+
+
+def _config(text):
+    """Normaliza a configuração (JSON) como no player.config_key."""
+    if text is None:
+        return None
+    return json.dumps(json.loads(text), sort_keys=True)
+
+
+def cmd_diff(args):
+    from results_store import ResultsStore
+
+    store = ResultsStore(os.path.join(_paths(args)["results"], "results.sqlite"))
+    try:
+        report = store.diff(args.run_a, args.run_b, args.algorithm_a, args.algorithm_b,
+                            _config(args.config_a), _config(args.config_b))
+    finally:
+        store.close()
+    if not report:
+        print("Nenhuma sessão em comum entre os runs.")
+        return 1
+
+    print(f"{'família':<16}{'algoritmo':<16}{'métrica':<13}{'n':>5}"
+          f"{args.run_a:>14}{args.run_b:>14}{'delta':>12}{'p':>9}")
+    configs = None
+    for row in report:
+        if (row["config_a"], row["config_b"]) != configs:
+            configs = (row["config_a"], row["config_b"])
+            print(f"# config: {row['config_a']} -> {row['config_b']}")
+        mark = " *" if row["p_value"] < args.alpha else ""
+        print(f"{row['family']:<16}{row['algorithm']:<16}{row['metric']:<13}{row['n']:>5}"
+              f"{row['mean_a']:>14.2f}{row['mean_b']:>14.2f}{row['delta']:>12.2f}"
+              f"{row['p_value']:>9.4f}{mark}")
+    print(f"\n* diferença significativa (Wilcoxon pareado por trace, p < {args.alpha})")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="abr", description="Simulação e análise de algoritmos de ABR.")
+    parser.add_argument("--root", default=DEFAULT_ROOT,
+                        help="pasta base com traces/, envivio/, results/ e graphs/ (padrão: $ABR_ROOT ou /app)")
+    parser.add_argument("--traces", help="pasta de traces (padrão: <root>/traces)")
+    parser.add_argument("--video-sizes", help="prefixo dos arquivos video_size_N (padrão: <root>/envivio/video_size_)")
+    parser.add_argument("--results", help="pasta de logs e CSVs (padrão: <root>/results)")
+    parser.add_argument("--graphs", help="pasta de gráficos (padrão: <root>/graphs)")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    p = subparsers.add_parser("simulate", help="simula traces do zero (sem ledger)")
+    p.add_argument("--algorithm", nargs="+", default=ALGORITHMS, choices=ALGORITHMS)
+    p.add_argument("--trace", nargs="+", help="nomes dos traces (padrão: todos)")
+    p.add_argument("--workers", type=int, default=1)
+    p.set_defaults(func=cmd_simulate)
+
+    p = subparsers.add_parser("sweep", help="varredura retomável (ledger em <results>/ledger.sqlite)")
+    p.add_argument("--algorithm", nargs="+", default=ALGORITHMS, choices=ALGORITHMS)
+    p.add_argument("--select", nargs="+", metavar="FILTRO=VALOR", type=_selection_item,
+                   help="filtros do trace_index, p.ex. max_p10=1.0 min_duration=300")
+    p.add_argument("--replications", type=int, default=1,
+                   help="replicações > 0 começam cada trace em um ponto sorteado")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--run-id", help="ao final, registra os logs neste run do results.sqlite")
+    p.add_argument("--note", default="", help="descrição do run")
+    p.set_defaults(func=cmd_sweep)
+
+    p = subparsers.add_parser("metrics", help="métricas por família (CSV e boxplots)")
+    p.add_argument("--no-figures", action="store_true", help="gera apenas os CSVs")
+    p.add_argument("--workers", type=int, default=None)
+    p.set_defaults(func=cmd_metrics)
+
+    p = subparsers.add_parser("plot", help="séries temporais por trace e por família")
+    p.add_argument("--workers", type=int, default=None)
+    p.set_defaults(func=cmd_plot)
+
+    p = subparsers.add_parser("ingest", help="registra os logs atuais como um run em <results>/results.sqlite")
+    p.add_argument("run_id")
+    p.add_argument("--note", default="", help="descrição do run")
+    p.set_defaults(func=cmd_ingest)
+
+    p = subparsers.add_parser("runs", help="lista os runs registrados")
+    p.set_defaults(func=cmd_runs)
+
+    p = subparsers.add_parser("diff", help="compara dois runs por família (bitrate, stall, trocas, latência)")
+    p.add_argument("run_a", help="run de referência (baseline)")
+    p.add_argument("run_b", help="run comparado (candidato)")
+    p.add_argument("--algorithm-a", help="algoritmo do run_a (padrão: cada algoritmo com ele mesmo)")
+    p.add_argument("--algorithm-b", help="algoritmo do run_b")
+    p.add_argument("--config-a", help='configuração do run_a em JSON, p.ex. \'{"bmin": 4}\' (padrão: todas)')
+    p.add_argument("--config-b", help="configuração do run_b em JSON")
+    p.add_argument("--alpha", type=float, default=0.05, help="nível de significância")
+    p.set_defaults(func=cmd_diff)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
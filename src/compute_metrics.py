@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 import os
 import csv
-import matplotlib.pyplot as plt
+import argparse
+from multiprocessing import Pool
 import numpy as np
+from trace_index import trace_family
+from figure_jobs import render_figures
+from sketch import QuantileSketch, merge_sketches
 
 COMPARATIVE_GRAPHS_DIR = "/app/graphs/graphs_comparative"
 BB_LOG_FOLDER = "/app/results/results_bb"
@@ -12,81 +16,141 @@ STALLION_LOG_FOLDER = "/app/results/results_stallion"
 EXPORT_CSV = True
 CSV_OUTPUT_PATH = "/app/results/family_comparison.csv"
 
-def compute_family_metrics(log_folder, algorithm_name):
+# Figuras: desative para gerar apenas o CSV
+EXPORT_FIGURES = True
+FIGURE_WORKERS = None  # processos para renderizar figuras (None = nº de CPUs)
+
+# Métricas de cauda (por chunk), via sketches de quantis em streaming
+TAIL_CSV_OUTPUT_PATH = "/app/results/family_tail_metrics.csv"
+SKETCH_COLUMNS = {'delay': 7, 'throughput': 8, 'buffer': 4, 'rebuffer': 5}  # métrica -> coluna do log
+TAIL_QUANTILES = [0.5, 0.95, 0.99]
+
+def session_metrics(log_path):
+    """
+    Lê um arquivo de log (uma sessão = um trace) em streaming.
+
+    Retorna (family_name, metrics, sketches), com:
+      metrics = {'bitrate': média (kbps), 'total_stall': s, 'switches': n,
+                 'delay': média (ms)}
+      sketches[metric] = QuantileSketch da sessão para SKETCH_COLUMNS
+    ou None se o log não tiver linhas válidas.
+    """
+    family_name = None
+    prev_bitrate = None
+    total_stall = 0.0
+    switches = 0
+    bitrates = []
+    delays = []
+    values = {metric: [] for metric in SKETCH_COLUMNS}
+    with open(log_path, "r") as f:
+        reader = csv.reader(f)
+        for row in reader:
+            # Esperamos 9 colunas:
+            # [0]=alg, [1]=trace_name, [2]=time_stamp, [3]=bit_rate,
+            # [4]=buffer_size, [5]=rebuf, [6]=chunk_size, [7]=delay, [8]=throughput
+            if len(row) < 9:
+                continue
+            try:
+                trace_name  = row[1].strip()
+                bit_rate    = float(row[3])   # kbps
+                rebuf       = float(row[5])   # s
+                delay_ms    = float(row[7])   # ms (interpretação de latência/download)
+                row_values  = {metric: float(row[col]) for metric, col in SKETCH_COLUMNS.items()}
+            except ValueError:
+                continue
+
+            # Identifica a "família": ex. "norway_car_2" => "norway_car"
+            # (pela primeira linha: a sessão inteira é de um único trace)
+            if family_name is None:
+                family_name = trace_family(trace_name)
+
+            # Atualiza valores
+            bitrates.append(bit_rate)
+            total_stall += rebuf
+            delays.append(delay_ms)
+            for metric, value in row_values.items():
+                values[metric].append(value)
+
+            # Conta trocas de qualidade
+            if prev_bitrate is None:
+                prev_bitrate = bit_rate
+            else:
+                if bit_rate != prev_bitrate:
+                    switches += 1
+                prev_bitrate = bit_rate
+
+    if family_name is None:
+        return None
+
+    sketches = {}
+    for metric, metric_values in values.items():
+        sketches[metric] = QuantileSketch()
+        sketches[metric].update(metric_values)
+
+    metrics = {
+        'bitrate': np.mean(bitrates) if bitrates else 0.0,
+        'total_stall': total_stall,
+        'switches': switches,
+        'delay': np.mean(delays) if delays else 0.0,
+    }
+    return family_name, metrics, sketches
+
+
+def compute_family_metrics(log_folder, algorithm_name, workers=1):
     """
     Lê todos os arquivos de log em 'log_folder' (p.ex. BB ou Stallion)
     e agrupa as métricas por 'família' de trace.
 
-    Inclui 'delays' para calcular latência média (ms).
+    Inclui 'delays' para calcular latência média (ms) e, em 'sketches',
+    os sketches de quantis (por chunk) de cada família, mesclados
+    entre as sessões. Com workers != 1 os logs são lidos em paralelo.
     Retorna:
       family_dict[family_name] = {
           'bitrates': [],
           'total_stalls': [],
           'switches': [],
-          'delays': []
+          'delays': [],
+          'sketches': {metric: QuantileSketch}
       }
     """
     family_dict = {}
-    log_files = [f for f in os.listdir(log_folder)
-                if os.path.isfile(os.path.join(log_folder, f))]
-
-    for log_file in log_files:
-        log_path = os.path.join(log_folder, log_file)
-        with open(log_path, "r") as f:
-            reader = csv.reader(f)
-            prev_bitrate = None
-            total_stall = 0.0
-            switches = 0
-            bitrates = []
-            delays = []
-            for row in reader:
-                # Esperamos 9 colunas:
-                # [0]=alg, [1]=trace_name, [2]=time_stamp, [3]=bit_rate,
-                # [4]=buffer_size, [5]=rebuf, [6]=chunk_size, [7]=delay, [8]=throughput
-                if len(row) < 9:
-                    continue
-                try:
-                    trace_name  = row[1].strip()
-                    bit_rate    = float(row[3])   # kbps
-                    rebuf       = float(row[5])   # s
-                    delay_ms    = float(row[7])   # ms (interpretação de latência/download)
-                except ValueError:
-                    continue
-
-                # Identifica a "família": ex. "norway_car_2" => "norway_car"
-                parts = trace_name.rsplit("_", 1)
-                if len(parts) == 2:
-                    family_name = parts[0]
-                else:
-                    family_name = trace_name
-
-                # Inicializa se não existe
-                if family_name not in family_dict:
-                    family_dict[family_name] = {
-                        'bitrates': [],
-                        'total_stalls': [],
-                        'switches': [],
-                        'delays': []
-                    }
-
-                # Atualiza valores
-                bitrates.append(bit_rate)
-                total_stall += rebuf
-                delays.append(delay_ms)
-
-                # Conta trocas de qualidade
-                if prev_bitrate is None:
-                    prev_bitrate = bit_rate
-                else:
-                    if bit_rate != prev_bitrate:
-                        switches += 1
-                    prev_bitrate = bit_rate
-
-            # Após ler todo o log file, adiciona os valores agregados na família
-            family_dict[family_name]['bitrates'].append(np.mean(bitrates) if bitrates else 0.0)
-            family_dict[family_name]['total_stalls'].append(total_stall)
-            family_dict[family_name]['switches'].append(switches)
-            family_dict[family_name]['delays'].append(np.mean(delays) if delays else 0.0)
+    log_paths = [os.path.join(log_folder, f) for f in sorted(os.listdir(log_folder))
+                 if os.path.isfile(os.path.join(log_folder, f))]
+
+    if workers == 1:
+        sessions = map(session_metrics, log_paths)
+        pool = None
+    else:
+        pool = Pool(processes=workers)
+        sessions = pool.imap(session_metrics, log_paths, chunksize=16)
+
+    try:
+        for session in sessions:
+            if session is None:
+                continue
+            family_name, metrics, sketches = session
+
+            # Inicializa se não existe
+            if family_name not in family_dict:
+                family_dict[family_name] = {
+                    'bitrates': [],
+                    'total_stalls': [],
+                    'switches': [],
+                    'delays': [],
+                    'sketches': {metric: QuantileSketch() for metric in SKETCH_COLUMNS}
+                }
+
+            # Adiciona os valores agregados da sessão na família
+            family_dict[family_name]['bitrates'].append(metrics['bitrate'])
+            family_dict[family_name]['total_stalls'].append(metrics['total_stall'])
+            family_dict[family_name]['switches'].append(metrics['switches'])
+            family_dict[family_name]['delays'].append(metrics['delay'])
+            for metric, sketch in sketches.items():
+                family_dict[family_name]['sketches'][metric].merge(sketch)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     return family_dict
 
@@ -123,11 +187,13 @@ def aggregate_family_dict(family_dict):
 # FUNÇÕES DE PLOTAGEM COM BOXPLOTS
 # -------------------------
 
-def plot_family_separated_boxplots(family_name, bb_metrics, st_metrics):
+def plot_family_separated_boxplots(family_name, bb_metrics, st_metrics, out_dir=COMPARATIVE_GRAPHS_DIR):
     """
     Gera 4 boxplots SEPARADOS (bitrate, stalls, switches, latência)
     para a 'família' family_name, comparando BB vs. Stallion.
+    Retorna a lista de arquivos gerados.
     """
+    import matplotlib.pyplot as plt  # import tardio: só quem gera figuras paga o custo
     bb_bitrates = bb_metrics['bitrates']
     bb_stalls = bb_metrics['total_stalls']
     bb_switches = bb_metrics['switches']
@@ -145,6 +211,7 @@ def plot_family_separated_boxplots(family_name, bb_metrics, st_metrics):
         'Latency (ms)': (bb_delays, st_delays)
     }
 
+    outputs = []
     for metric_name, (bb_values, st_values) in metrics.items():
         plt.figure(figsize=(6, 4))
         data = [bb_values, st_values]
@@ -153,15 +220,18 @@ def plot_family_separated_boxplots(family_name, bb_metrics, st_metrics):
                     medianprops=dict(color="red"))
         plt.ylabel(metric_name)
         plt.title(f"[{family_name}] {metric_name}")
-        out_png = os.path.join(COMPARATIVE_GRAPHS_DIR, f"{family_name}_{metric_name.replace(' ', '_')}.png")
+        out_png = os.path.join(out_dir, f"{family_name}_{metric_name.replace(' ', '_')}.png")
         plt.savefig(out_png)
         plt.close()
+        outputs.append(out_png)
+    return outputs
 
-def plot_family_all_in_one_boxplot(family_name, bb_metrics, st_metrics):
+def plot_family_all_in_one_boxplot(family_name, bb_metrics, st_metrics, out_dir=COMPARATIVE_GRAPHS_DIR):
     """
     Gera UM gráfico com 4 boxplots agrupados: (Bitrate, Stall, Switches, Latency)
     comparando BB vs Stallion para essa 'família'.
     """
+    import matplotlib.pyplot as plt
     bb_bitrates = bb_metrics['bitrates']
     bb_stalls = bb_metrics['total_stalls']
     bb_switches = bb_metrics['switches']
@@ -205,16 +275,18 @@ def plot_family_all_in_one_boxplot(family_name, bb_metrics, st_metrics):
     ax.legend([box_bb["boxes"][0], box_st["boxes"][0]], ["BB", "Stallion"])
 
     plt.tight_layout()
-    out_png = os.path.join(COMPARATIVE_GRAPHS_DIR, f"compare_family_boxplot_{family_name}.png")
+    out_png = os.path.join(out_dir, f"compare_family_boxplot_{family_name}.png")
     plt.savefig(out_png)
     plt.close()
+    return [out_png]
 
 
-def plot_overall_boxplots(metric_label, bb_values, st_values):
+def plot_overall_boxplots(metric_label, bb_values, st_values, out_dir=COMPARATIVE_GRAPHS_DIR):
     """
     Gera UM gráfico de boxplot comparando BB x Stallion
     para a soma ou média de todos os traces (Overall).
     """
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(6, 4))
     data = [bb_values, st_values]
     plt.boxplot(data, labels=["BB", "Stallion"], patch_artist=True,
@@ -222,12 +294,13 @@ def plot_overall_boxplots(metric_label, bb_values, st_values):
                 medianprops=dict(color="red"))
     plt.ylabel(metric_label)
     plt.title(f"Comparação Geral - {metric_label}")
-    out_png = os.path.join(COMPARATIVE_GRAPHS_DIR, f"overall_boxplot_{metric_label.replace(' ', '_')}.png")
+    out_png = os.path.join(out_dir, f"overall_boxplot_{metric_label.replace(' ', '_')}.png")
     plt.savefig(out_png)
     plt.close()
+    return [out_png]
 
 
-def plot_big_unified_boxplots(all_families, bb_agg, st_agg):
+def plot_big_unified_boxplots(all_families, bb_agg, st_agg, out_dir=COMPARATIVE_GRAPHS_DIR):
     """
     Cria UM gráfico unificado (com 4 subplots) comparando TODAS as famílias
     para 4 métricas (Bitrate, Stall, Switches, Latência).
@@ -236,6 +309,7 @@ def plot_big_unified_boxplots(all_families, bb_agg, st_agg):
       - Eixo x = cada família
       - Boxplots BB vs Stallion
     """
+    import matplotlib.pyplot as plt
     # Ordena as famílias
     families = sorted(all_families)
 
@@ -267,24 +341,46 @@ def plot_big_unified_boxplots(all_families, bb_agg, st_agg):
         axs[row, col].tick_params(axis='x', rotation=90)
 
     plt.tight_layout(rect=[0, 0.03, 1, 0.95])  # Ajusta para deixar espaço para o título
-    out_png = os.path.join(COMPARATIVE_GRAPHS_DIR, "all_families_unified_boxplots.png")
+    out_png = os.path.join(out_dir, "all_families_unified_boxplots.png")
     plt.savefig(out_png)
     plt.close()
+    return [out_png]
 
 
-def main():
+def tail_metrics_lines(family_name, algorithm, sketches):
+    """
+    Linhas do CSV de métricas de cauda: uma por métrica, com contagem,
+    média, quantis TAIL_QUANTILES e máximo (por chunk).
+    """
+    lines = []
+    for metric in SKETCH_COLUMNS:
+        sketch = sketches[metric]
+        quantiles = ",".join(f"{sketch.quantile(q):.3f}" for q in TAIL_QUANTILES)
+        max_value = sketch.max if sketch.count else 0.0
+        lines.append(f"{family_name},{algorithm},{metric},{sketch.count},"
+                     f"{sketch.mean:.3f},{quantiles},{max_value:.3f}")
+    return lines
+
+
+def main(export_figures=EXPORT_FIGURES, workers=FIGURE_WORKERS,
+         bb_log_folder=BB_LOG_FOLDER, stallion_log_folder=STALLION_LOG_FOLDER,
+         graphs_dir=COMPARATIVE_GRAPHS_DIR, csv_output_path=CSV_OUTPUT_PATH,
+         tail_csv_output_path=TAIL_CSV_OUTPUT_PATH):
     # 1) Lê e agrega métricas para BB
-    bb_families = compute_family_metrics(BB_LOG_FOLDER, "bb")
+    bb_families = compute_family_metrics(bb_log_folder, "bb", workers)
     bb_agg = aggregate_family_dict(bb_families)
 
     # 2) Lê e agrega métricas para Stallion
-    st_families = compute_family_metrics(STALLION_LOG_FOLDER, "stallion")
+    st_families = compute_family_metrics(stallion_log_folder, "stallion", workers)
     st_agg = aggregate_family_dict(st_families)
 
     # 3) Lista de todas as famílias
     all_families = sorted(set(bb_agg.keys()).union(st_agg.keys()))
-    if not os.path.exists(COMPARATIVE_GRAPHS_DIR):
-        os.makedirs(COMPARATIVE_GRAPHS_DIR)
+    if export_figures and not os.path.exists(graphs_dir):
+        os.makedirs(graphs_dir)
+
+    # Jobs de figuras, renderizados no final (em paralelo e com cache)
+    figure_jobs = []
 
     # Variáveis para "Overall" (usando listas para boxplots)
     overall_bb_bitrates = []
@@ -300,6 +396,9 @@ def main():
     # Preparar CSV
     csv_lines = []
     csv_lines.append("family_name,algorithm,avg_bitrate,avg_stall,total_switches,avg_latency")
+    tail_lines = []
+    tail_lines.append("family_name,algorithm,metric,count,mean,"
+                      + ",".join(f"p{int(q * 100)}" for q in TAIL_QUANTILES) + ",max")
 
     print("== Métricas por Família ==")
     for fam in all_families:
@@ -307,9 +406,11 @@ def main():
         bb_metrics = bb_agg.get(fam, {'bitrates': [], 'total_stalls': [], 'switches': [], 'delays': []})
         st_metrics = st_agg.get(fam, {'bitrates': [], 'total_stalls': [], 'switches': [], 'delays': []})
 
-        # Gera gráficos por família (separados e boxplot unificado)
-        plot_family_separated_boxplots(fam, bb_metrics, st_metrics)
-        plot_family_all_in_one_boxplot(fam, bb_metrics, st_metrics)
+        # Gráficos por família (separados e boxplot unificado)
+        figure_jobs.append((f"separated/{fam}", plot_family_separated_boxplots,
+                            (fam, bb_metrics, st_metrics, graphs_dir)))
+        figure_jobs.append((f"all_in_one/{fam}", plot_family_all_in_one_boxplot,
+                            (fam, bb_metrics, st_metrics, graphs_dir)))
 
         # Print no console
         avg_bitrate_bb = np.mean(bb_metrics['bitrates']) if bb_metrics['bitrates'] else 0.0
@@ -332,6 +433,11 @@ def main():
         csv_lines.append(f"{fam},BB,{avg_bitrate_bb:.2f},{avg_stall_bb:.2f},{total_switches_bb},{avg_delay_bb:.2f}")
         csv_lines.append(f"{fam},Stallion,{avg_bitrate_st:.2f},{avg_stall_st:.2f},{total_switches_st},{avg_delay_st:.2f}")
 
+        # Métricas de cauda da família (sketches já mesclados entre as sessões)
+        for algorithm, families in [("BB", bb_families), ("Stallion", st_families)]:
+            if fam in families:
+                tail_lines.extend(tail_metrics_lines(fam, algorithm, families[fam]['sketches']))
+
         # Acumula para "Overall" (listas para boxplots)
         overall_bb_bitrates.extend(bb_metrics['bitrates'])
         overall_bb_stalls.extend(bb_metrics['total_stalls'])
@@ -343,11 +449,15 @@ def main():
         overall_st_switches.extend(st_metrics['switches'])
         overall_st_delays.extend(st_metrics['delays'])
 
-    # Plota comparações gerais usando boxplots
-    plot_overall_boxplots("Bitrate (kbps)", overall_bb_bitrates, overall_st_bitrates)
-    plot_overall_boxplots("Total Stall (s)", overall_bb_stalls, overall_st_stalls)
-    plot_overall_boxplots("Switches", overall_bb_switches, overall_st_switches)
-    plot_overall_boxplots("Latency (ms)", overall_bb_delays, overall_st_delays)
+    # Comparações gerais usando boxplots
+    for metric_label, bb_values, st_values in [
+        ("Bitrate (kbps)", overall_bb_bitrates, overall_st_bitrates),
+        ("Total Stall (s)", overall_bb_stalls, overall_st_stalls),
+        ("Switches", overall_bb_switches, overall_st_switches),
+        ("Latency (ms)", overall_bb_delays, overall_st_delays),
+    ]:
+        figure_jobs.append((f"overall/{metric_label}", plot_overall_boxplots,
+                            (metric_label, bb_values, st_values, graphs_dir)))
 
     print("\n== Comparação Geral (agregado) ==")
     overall_avg_bitrate_bb = np.mean(overall_bb_bitrates) if overall_bb_bitrates else 0.0
@@ -369,20 +479,45 @@ def main():
           f"Switches Total={overall_total_switches_st}, "
           f"Latência Média={overall_avg_delay_st:.2f}ms")
 
+    # Sketches gerais: mescla as famílias
+    for algorithm, families in [("BB", bb_families), ("Stallion", st_families)]:
+        overall_sketches = {
+            metric: merge_sketches(families[fam]['sketches'][metric] for fam in families)
+            for metric in SKETCH_COLUMNS
+        }
+        tail_lines.extend(tail_metrics_lines("overall", algorithm, overall_sketches))
+        print(f"{algorithm} -> Latência p95={overall_sketches['delay'].quantile(0.95):.2f}ms, "
+              f"Rebuffer p99={overall_sketches['rebuffer'].quantile(0.99):.3f}s "
+              f"(por chunk)")
+
     # Salva no CSV
     if EXPORT_CSV:
-        csv_out_dir = os.path.dirname(CSV_OUTPUT_PATH)
+        csv_out_dir = os.path.dirname(csv_output_path)
         if csv_out_dir and not os.path.exists(csv_out_dir):
             os.makedirs(csv_out_dir)
-        with open(CSV_OUTPUT_PATH, "w") as fcsv:
+        with open(csv_output_path, "w") as fcsv:
             fcsv.write("\n".join(csv_lines))
-        print(f"\n[OK] Arquivo CSV gerado em: {CSV_OUTPUT_PATH}")
+        print(f"\n[OK] Arquivo CSV gerado em: {csv_output_path}")
+        with open(tail_csv_output_path, "w") as fcsv:
+            fcsv.write("\n".join(tail_lines))
+        print(f"[OK] Métricas de cauda geradas em: {tail_csv_output_path}")
+
+    if not export_figures:
+        return
 
-    # Gera gráfico unificado com boxplots para todas as famílias
-    plot_big_unified_boxplots(all_families, bb_agg, st_agg)
+    # Gráfico unificado com boxplots para todas as famílias
+    figure_jobs.append(("unified", plot_big_unified_boxplots,
+                        (all_families, bb_agg, st_agg, graphs_dir)))
 
-    print(f"\n[INFO] Gráficos salvos em: {COMPARATIVE_GRAPHS_DIR}")
+    rendered, skipped = render_figures(figure_jobs, graphs_dir, workers=workers)
+    print(f"\n[INFO] Gráficos salvos em: {graphs_dir} "
+          f"(gerados: {rendered}, sem alteração: {skipped})")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Calcula métricas por família de traces.")
+    parser.add_argument("--no-figures", action="store_true", help="gera apenas o CSV, sem gráficos")
+    parser.add_argument("--workers", type=int, default=FIGURE_WORKERS,
+                        help="processos para ler logs e renderizar gráficos (padrão: nº de CPUs)")
+    args = parser.parse_args()
+    main(export_figures=not args.no_figures, workers=args.workers)
@@ -0,0 +1,98 @@
+"""
+Renderização de figuras em paralelo, com cache pelo conteúdo dos dados.
+
+Cada job é uma tupla (key, func, args):
+  - key:  identificador estável da figura (p.ex. "trace/norway_bus_1");
+  - func: função de plotagem de nível de módulo (precisa ser "picklable"),
+          que recebe *args e retorna a lista de arquivos gravados;
+  - args: dados de entrada da figura.
+
+O hash de (func, args) é guardado em um manifesto JSON na pasta de saída;
+na próxima execução, jobs com o mesmo hash e com os arquivos ainda presentes
+não são renderizados de novo.
+"""
+import os
+import json
+import pickle
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+MANIFEST_NAME = ".figure_cache.json"
+
+
+def use_agg_backend():
+    """Backend não interativo: os workers só gravam PNGs."""
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def job_hash(func, args):
+    payload = pickle.dumps((func.__module__, func.__name__, args), protocol=4)
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest_path, manifest):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _run_job(job):
+    key, func, args = job
+    return key, func(*args)
+
+
+def render_figures(jobs, manifest_dir, workers=None, force=False):
+    """
+    Renderiza os jobs que mudaram desde a última execução.
+
+    :param manifest_dir: pasta onde o manifesto de hashes é mantido.
+    :param workers: nº de processos (None = nº de CPUs, 1 = serial).
+    :param force: ignora o cache e renderiza tudo.
+    Retorna (renderizadas, ignoradas).
+    """
+    if not os.path.exists(manifest_dir):
+        os.makedirs(manifest_dir)
+    manifest_path = os.path.join(manifest_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+
+    hashes = {}
+    pending = []
+    for key, func, args in jobs:
+        h = job_hash(func, args)
+        hashes[key] = h
+        entry = manifest.get(key)
+        if (not force and entry is not None and entry["hash"] == h
+                and all(os.path.exists(p) for p in entry["outputs"])):
+            continue
+        pending.append((key, func, args))
+
+    if pending:
+        executor = None
+        if workers == 1 or len(pending) == 1:
+            use_agg_backend()
+            results = map(_run_job, pending)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=use_agg_backend)
+            results = executor.map(_run_job, pending)
+        try:
+            for key, outputs in results:
+                manifest[key] = {"hash": hashes[key], "outputs": list(outputs or [])}
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            # Salva o que já foi renderizado, mesmo se algum job falhar
+            _save_manifest(manifest_path, manifest)
+
+    return len(pending), len(jobs) - len(pending)
@@ -15,8 +15,23 @@ PACKET_SIZE = 1500  # bytes
 VIDEO_SIZE_FILE = "/app/envivio/video_size_"
 
 
+def load_video_size(video_size_file=None):
+    """Chunk sizes (bytes) per bitrate level: video_size[bitrate][chunk]."""
+    if video_size_file is None:
+        video_size_file = VIDEO_SIZE_FILE
+    video_size = {}  # in bytes
+    for bitrate in range(BITRATE_LEVELS):
+        video_size[bitrate] = []
+        with open(video_size_file + str(bitrate)) as f:
+            for line in f:
+                video_size[bitrate].append(int(line.split()[0]))
+    return video_size
+
+
 class Environment:
-    def __init__(self, all_cooked_time, all_cooked_bw, random_seed=RANDOM_SEED):
+    def __init__(self, all_cooked_time, all_cooked_bw, random_seed=RANDOM_SEED, video_size=None):
+        # video_size: preloaded chunk sizes (e.g. a shared trace_pool view),
+        # indexed as video_size[bitrate][chunk]; read from disk if None
         assert len(all_cooked_time) == len(all_cooked_bw)
 
         np.random.seed(random_seed)
@@ -24,27 +39,32 @@ class Environment:
         self.all_cooked_time = all_cooked_time
         self.all_cooked_bw = all_cooked_bw
 
+        self.mahimahi_start_ptr = 1
+        self.reset(trace_idx=0)
+
+        if video_size is None:
+            video_size = load_video_size()
+        self.video_size = video_size  # in bytes
+
+    def reset(self, trace_idx=0, start_ptr=None):
+        """
+        Restart the video (empty buffer, first chunk) on trace trace_idx,
+        starting at sample start_ptr (default: mahimahi_start_ptr).
+        """
         self.video_chunk_counter = 0
         self.buffer_size = 0
 
-        # pick a random trace file
-        self.trace_idx = 0
+        self.trace_idx = trace_idx
         self.cooked_time = self.all_cooked_time[self.trace_idx]
         self.cooked_bw = self.all_cooked_bw[self.trace_idx]
 
-        self.mahimahi_start_ptr = 1
         # randomize the start point of the trace
         # note: trace file starts with time 0
-        self.mahimahi_ptr = 1
+        if start_ptr is None:
+            start_ptr = self.mahimahi_start_ptr
+        self.mahimahi_ptr = start_ptr
         self.last_mahimahi_time = self.cooked_time[self.mahimahi_ptr - 1]
 
-        self.video_size = {}  # in bytes
-        for bitrate in range(BITRATE_LEVELS):
-            self.video_size[bitrate] = []
-            with open(VIDEO_SIZE_FILE + str(bitrate)) as f:
-                for line in f:
-                    self.video_size[bitrate].append(int(line.split()[0]))
-
     def get_video_chunk(self, quality):
 
         assert quality >= 0
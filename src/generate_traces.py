@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Gerador de traces sintéticos para testes de escala e de estresse.
+
+Produz traces no mesmo formato dos traces da Noruega (uma amostra por linha,
+"<tempo_s>\\t<banda_mbps>") ou em um armazenamento binário (.npy com shape
+(N, 2), colunas tempo e banda), que o load_trace também sabe ler.
+
+Modelos de banda disponíveis:
+  - markov: banda modulada por uma cadeia de Markov com K níveis;
+  - onoff:  banda estável intercalada com períodos de queda (outage);
+  - step:   degraus de banda que mudam em instantes aleatórios.
+
+Cada trace usa a semente (seed, modelo, índice), então a geração é reprodutível e
+independente do número de processos usados.
+"""
+import os
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+OUTPUT_FOLDER = "/app/traces_synthetic/"
+MODELS = ["markov", "onoff", "step"]
+SAMPLE_INTERVAL = 0.5  # s, intervalo médio entre amostras (como nos traces da Noruega)
+SAMPLE_JITTER = 0.2    # fração do intervalo usada como variação aleatória
+MIN_BW = 0.2           # Mbps
+MAX_BW = 8.0           # Mbps
+OUTAGE_BW = 0.01       # Mbps, banda durante uma queda (evita banda zero no Environment)
+NOISE_STD = 0.15       # desvio padrão do ruído log-normal multiplicativo
+RANDOM_SEED = 42
+
+# Parâmetros dos modelos
+MARKOV_STATES = 5
+MARKOV_STAY_PROB = 0.98   # probabilidade de permanecer no mesmo estado a cada amostra
+ONOFF_MEAN_ON = 120       # amostras, duração média de um período "ligado"
+ONOFF_MEAN_OFF = 10       # amostras, duração média de uma queda
+STEP_MEAN_LEN = 200       # amostras, duração média de cada degrau
+
+
+def _dwell_states(rng, n_samples, mean_len, next_states):
+    """
+    Gera uma sequência de estados com tempos de permanência geométricos,
+    totalmente vetorizada (sem laço por amostra).
+
+    :param mean_len: duração média (em amostras) de cada permanência.
+    :param next_states: função (rng, n_segmentos) -> estado de cada segmento.
+    """
+    p = 1.0 / max(mean_len, 1.0)
+    # Sorteia segmentos suficientes para cobrir n_samples com folga
+    n_segments = int(n_samples * p * 1.5) + 16
+    while True:
+        lengths = rng.geometric(p, size=n_segments)
+        if lengths.sum() >= n_samples:
+            break
+        n_segments *= 2
+    states = next_states(rng, n_segments)
+    return np.repeat(states, lengths)[:n_samples]
+
+
+def _sample_times(rng, n_samples):
+    steps = SAMPLE_INTERVAL * (1.0 + SAMPLE_JITTER * rng.uniform(-1.0, 1.0, size=n_samples - 1))
+    times = np.empty(n_samples)
+    times[0] = 0.0  # o Environment assume que o trace começa em 0
+    np.cumsum(steps, out=times[1:])
+    return times
+
+
+def _noise(rng, n_samples):
+    return rng.lognormal(mean=0.0, sigma=NOISE_STD, size=n_samples)
+
+
+def markov_bw(rng, n_samples):
+    """Banda modulada por cadeia de Markov: cada estado tem um nível médio."""
+    levels = np.geomspace(MIN_BW, MAX_BW, MARKOV_STATES)
+
+    def next_states(rng, n_segments):
+        # Cada transição sai do estado atual para um dos outros K-1 estados
+        jumps = rng.integers(1, MARKOV_STATES, size=n_segments)
+        jumps[0] = rng.integers(0, MARKOV_STATES)
+        return np.cumsum(jumps) % MARKOV_STATES
+
+    states = _dwell_states(rng, n_samples, 1.0 / (1.0 - MARKOV_STAY_PROB), next_states)
+    return levels[states] * _noise(rng, n_samples)
+
+
+def onoff_bw(rng, n_samples):
+    """Banda estável com quedas (outages) de duração aleatória."""
+    base = np.exp(rng.uniform(np.log(MIN_BW), np.log(MAX_BW)))
+    # Intercala períodos ligados e desligados com durações médias distintas
+    p_on = 1.0 / ONOFF_MEAN_ON
+    p_off = 1.0 / ONOFF_MEAN_OFF
+    n_segments = int(n_samples * 2 / (ONOFF_MEAN_ON + ONOFF_MEAN_OFF)) + 16
+    while True:
+        lengths = np.empty(2 * n_segments, dtype=np.int64)
+        lengths[0::2] = rng.geometric(p_on, size=n_segments)
+        lengths[1::2] = rng.geometric(p_off, size=n_segments)
+        if lengths.sum() >= n_samples:
+            break
+        n_segments *= 2
+    is_on = np.repeat(np.tile([True, False], n_segments), lengths)[:n_samples]
+    bw = base * _noise(rng, n_samples)
+    bw[~is_on] = OUTAGE_BW
+    return bw
+
+
+def step_bw(rng, n_samples):
+    """Banda constante por degraus, com mudança brusca de nível."""
+    def next_states(rng, n_segments):
+        return np.exp(rng.uniform(np.log(MIN_BW), np.log(MAX_BW), size=n_segments))
+
+    return _dwell_states(rng, n_samples, STEP_MEAN_LEN, next_states) * _noise(rng, n_samples)
+
+
+MODEL_FUNCS = {
+    "markov": markov_bw,
+    "onoff": onoff_bw,
+    "step": step_bw,
+}
+
+
+def generate_trace(model, n_samples, seed, idx):
+    """
+    Gera um trace sintético.
+
+    Retorna (cooked_time, cooked_bw) como arrays NumPy (tempo em s, banda em Mbps).
+    """
+    rng = np.random.default_rng([seed, MODELS.index(model), idx])
+    cooked_time = _sample_times(rng, n_samples)
+    cooked_bw = np.maximum(MODEL_FUNCS[model](rng, n_samples), OUTAGE_BW)
+    return cooked_time, cooked_bw
+
+
+def write_trace(file_path, cooked_time, cooked_bw, binary=False):
+    if binary:
+        np.save(file_path, np.column_stack([cooked_time, cooked_bw]))
+    else:
+        np.savetxt(file_path, np.column_stack([cooked_time, cooked_bw]),
+                   fmt="%.6f", delimiter="\t")
+
+
+def _generate_job(job):
+    model, idx, n_samples, seed, output_folder, binary = job
+    # Nome segue o padrão <família>_<n>, usado pelo compute_metrics
+    trace_name = f"synthetic_{model}_{idx}"
+    file_path = os.path.join(output_folder, trace_name + (".npy" if binary else ""))
+    cooked_time, cooked_bw = generate_trace(model, n_samples, seed, idx)
+    write_trace(file_path, cooked_time, cooked_bw, binary)
+    return trace_name
+
+
+def generate_traces(output_folder=OUTPUT_FOLDER, models=MODELS, n_traces=10,
+                    n_samples=200, seed=RANDOM_SEED, binary=False, workers=None):
+    """
+    Gera n_traces traces por modelo em output_folder, em paralelo.
+
+    Retorna a lista com os nomes dos traces gerados.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    jobs = [(model, idx, n_samples, seed, output_folder, binary)
+            for model in models for idx in range(n_traces)]
+
+    if workers == 1:
+        return [_generate_job(job) for job in jobs]
+    with Pool(processes=workers) as pool:
+        return list(pool.imap_unordered(_generate_job, jobs, chunksize=max(1, len(jobs) // 256)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera traces sintéticos de banda.")
+    parser.add_argument("--output", default=OUTPUT_FOLDER, help="pasta de saída dos traces")
+    parser.add_argument("--models", nargs="+", default=MODELS, choices=MODELS)
+    parser.add_argument("--traces", type=int, default=10, help="número de traces por modelo")
+    parser.add_argument("--samples", type=int, default=200, help="amostras por trace")
+    parser.add_argument("--seed", type=int, default=RANDOM_SEED)
+    parser.add_argument("--binary", action="store_true", help="grava traces em .npy")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: nº de CPUs)")
+    args = parser.parse_args()
+
+    names = generate_traces(args.output, args.models, args.traces, args.samples,
+                            args.seed, args.binary, args.workers)
+    print(f"{len(names)} traces gerados em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Registro persistente (SQLite) dos jobs concluídos de uma varredura.
+
+Cada job é uma sessão identificada por (algorithm, config, trace,
+replication). O player marca o job como concluído logo após gravar o log
+da sessão de forma atômica; ao reiniciar uma varredura interrompida, só
+rodam os jobs que ainda não estão no registro.
+
+Configurações diferentes de um algoritmo gravam no mesmo log; antes de
+sobrescrevê-lo, o player libera (release) os jobs registrados para esse log.
+"""
+import os
+import time
+import sqlite3
+
+LEDGER_PATH = "/app/results/ledger.sqlite"
+
+
+class JobLedger:
+    def __init__(self, path=LEDGER_PATH):
+        out_dir = os.path.dirname(path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # WAL: escritas duráveis sem bloquear leitores
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " algorithm TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " trace TEXT NOT NULL,"
+            " replication INTEGER NOT NULL,"
+            " log_path TEXT NOT NULL,"
+            " finished_at REAL NOT NULL,"
+            " PRIMARY KEY (algorithm, config, trace, replication))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_log_path ON jobs (log_path)")
+        self.conn.commit()
+
+    def completed(self, algorithm, config):
+        """
+        Jobs concluídos para (algorithm, config) cujo log ainda existe.
+        Retorna um set de (trace, replication).
+        """
+        rows = self.conn.execute(
+            "SELECT trace, replication, log_path FROM jobs WHERE algorithm = ? AND config = ?",
+            (algorithm, config),
+        )
+        return {(trace, replication) for trace, replication, log_path in rows
+                if os.path.exists(log_path)}
+
+    def sessions(self, algorithm, traces=None, replications=None):
+        """
+        Jobs concluídos de algorithm (qualquer configuração) cujo log ainda
+        existe, opcionalmente só os dos traces/replicações informados.
+        Retorna uma lista de (config, trace, replication, log_path).
+        """
+        rows = self.conn.execute(
+            "SELECT config, trace, replication, log_path FROM jobs WHERE algorithm = ?"
+            " ORDER BY replication, trace",
+            (algorithm,),
+        )
+        traces = set(traces) if traces is not None else None
+        return [(config, trace, replication, log_path)
+                for config, trace, replication, log_path in rows
+                if (traces is None or trace in traces)
+                and (replications is None or replication < replications)
+                and os.path.exists(log_path)]
+
+    def release(self, log_paths):
+        """
+        Remove os jobs (de qualquer configuração) cujo log está em log_paths,
+        pois esses logs serão sobrescritos.
+        """
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM jobs WHERE log_path = ?",
+                [(os.path.abspath(log_path),) for log_path in log_paths],
+            )
+
+    def mark_done(self, algorithm, config, trace, replication, log_path):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+                (algorithm, config, trace, replication, os.path.abspath(log_path), time.time()),
+            )
+
+    def close(self):
+        self.conn.close()
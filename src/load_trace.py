@@ -1,26 +1,56 @@
 import os
+import numpy as np
 
 
 COOKED_TRACE_FOLDER = "/app/traces/"
+BINARY_TRACE_EXT = ".npy"  # traces binários (N, 2) gerados pelo generate_traces
 
 
-def load_trace(cooked_trace_folder=COOKED_TRACE_FOLDER):
+def trace_name(cooked_file):
+    """Nome do trace a partir do nome do arquivo (sem a extensão binária)."""
+    if cooked_file.endswith(BINARY_TRACE_EXT):
+        return cooked_file[: -len(BINARY_TRACE_EXT)]
+    return cooked_file
+
+
+def read_trace(file_path):
+    """Lê um único trace (texto ou .npy). Retorna (cooked_time, cooked_bw)."""
+    if file_path.endswith(BINARY_TRACE_EXT):
+        trace = np.load(file_path)
+        return trace[:, 0].tolist(), trace[:, 1].tolist()
+
+    cooked_time = []
+    cooked_bw = []
+    # print file_path
+    with open(file_path, "rb") as f:
+        for line in f:
+            parse = line.split()
+            cooked_time.append(float(parse[0]))
+            cooked_bw.append(float(parse[1]))
+    return cooked_time, cooked_bw
+
+
+def load_trace(cooked_trace_folder=COOKED_TRACE_FOLDER, file_names=None):
+    """
+    Carrega os traces de cooked_trace_folder.
+
+    :param file_names: se informado, carrega apenas os traces com esses nomes
+                       (p.ex. uma seleção feita pelo trace_index).
+    """
     cooked_files = os.listdir(cooked_trace_folder)
+    if file_names is not None:
+        selected = set(file_names)
+        cooked_files = [f for f in cooked_files if trace_name(f) in selected]
     all_cooked_time = []
     all_cooked_bw = []
     all_file_names = []
     for cooked_file in cooked_files:
         file_path = cooked_trace_folder + cooked_file
-        cooked_time = []
-        cooked_bw = []
-        # print file_path
-        with open(file_path, "rb") as f:
-            for line in f:
-                parse = line.split()
-                cooked_time.append(float(parse[0]))
-                cooked_bw.append(float(parse[1]))
+        if not os.path.isfile(file_path):
+            continue
+        cooked_time, cooked_bw = read_trace(file_path)
         all_cooked_time.append(cooked_time)
         all_cooked_bw.append(cooked_bw)
-        all_file_names.append(cooked_file)
+        all_file_names.append(trace_name(cooked_file))
 
     return all_cooked_time, all_cooked_bw, all_file_names
@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 import os
+import json
+import zlib
+from multiprocessing import Pool
 import numpy as np
 import load_trace
+from trace_index import TraceIndex
+from ledger import JobLedger
+from trace_pool import TracePool
 from bb import bb_algo
 from stallion import Stallion
 import fixed_env as env
@@ -14,35 +20,66 @@ RANDOM_SEED = 42
 BMIN = 4 # Parâmetro para o BB
 BB_LOG_FOLDER = "/app/results/results_bb"
 STALLION_LOG_FOLDER = "/app/results/results_stallion"
+LOG_FOLDERS = {"bb": BB_LOG_FOLDER, "stallion": STALLION_LOG_FOLDER}
 LOG_FILE = "/log_"
+PARTIAL_FOLDER = "/.partial"  # logs em andamento (ignorados pelas métricas)
 TEST_TRACES = "/app/traces/"
+TRACE_INDEX = "/app/results/trace_index.csv"
+LEDGER_PATH = "/app/results/ledger.sqlite"
+REPLICATIONS = 1  # replicações > 0 começam cada trace em um ponto aleatório
+WORKERS = 1  # processos para simular sessões (traces compartilhados via trace_pool)
+# Filtros do trace_index (p.ex. {"max_p10": 1.0}); None simula todos os traces
+TRACE_SELECTION = None
+
+# Configuração de cada algoritmo (faz parte da identidade do job no ledger)
+ALGORITHM_CONFIGS = {
+    "bb": {"bmin": BMIN},
+    # Ajuste de parâmetros para ser mais conservador:
+    # window_size = mesma WINDOW_SIZE do Env,
+    # z_thr menor => Stallion menos agressivo
+    "stallion": {"window_size": 8, "z_thr": 0.1, "z_latency": 1.5},
+}
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
 
-def run_algorithm(algorithm, all_cooked_time, all_cooked_bw, all_file_names, log_folder):
-    print(f"Executando {algorithm} Algorithm")
 
-    if not os.path.exists(log_folder):
-        os.makedirs(log_folder)
+def replication_folder(log_folder, replication):
+    # A replicação 0 fica na pasta principal (lida pelo compute_metrics)
+    if replication == 0:
+        return log_folder
+    return os.path.join(log_folder, f"rep_{replication}")
 
-    net_env = env.Environment(all_cooked_time=all_cooked_time, all_cooked_bw=all_cooked_bw)
 
-    # Abre o primeiro arquivo de log
-    log_path = log_folder + LOG_FILE + all_file_names[net_env.trace_idx]
-    log_file = open(log_path, "w")
+def session_start(trace_name, trace_len, replication):
+    """
+    Amostra inicial do trace na sessão. A replicação 0 começa no início do
+    trace; as demais sorteiam o início com semente (RANDOM_SEED, replicação,
+    trace), então o resultado não depende da ordem nem do worker.
+    """
+    if replication == 0:
+        return 1
+    rng = np.random.RandomState([RANDOM_SEED, replication, zlib.crc32(trace_name.encode())])
+    return int(rng.randint(1, trace_len))
+
+
+def run_session(algorithm, config, net_env, trace_idx, trace_name, replication=0):
+    """
+    Simula um vídeo completo sobre o trace trace_idx.
+    Retorna as linhas do log da sessão.
+    """
+    trace_len = len(net_env.all_cooked_bw[trace_idx])
+    net_env.reset(trace_idx, session_start(trace_name, trace_len, replication))
 
     time_stamp_ms = 0.0  # manteraemos internalmente em ms
     bit_rate = DEFAULT_QUALITY
 
-    # Instancia Stallion, se for o caso
+    # Instancia Stallion, se for o caso (uma instância por sessão)
     if algorithm == "stallion":
-        algo_instance = Stallion(
-            video_bit_rate=VIDEO_BIT_RATE,
-            # Ajuste de parâmetros para ser mais conservador:
-            window_size=8,   # mesma WINDOW_SIZE do Env
-            z_thr=0.1,       # sensibilidade menor => Stallion menos agressivo,
-            z_latency=1.5
-        )
+        algo_instance = Stallion(video_bit_rate=VIDEO_BIT_RATE, **config)
 
-    video_count = 0
+    lines = []
     while True:
         (
             delay_ms,         # em ms
@@ -68,10 +105,9 @@ def run_algorithm(algorithm, all_cooked_time, all_cooked_bw, all_file_names, log
         # Monta a linha do log
         # Formato (9 colunas):
         # algorithm, trace_name, time_stamp_s, bit_rate_kbps, buffer_s, rebuffer_s, chunk_size_bytes, delay_ms, throughput_kbps
-        # Usaremos "all_file_names[net_env.trace_idx]" como "trace_name" (2ª coluna do CSV).
-        line = (
+        lines.append(
             f"{algorithm},"
-            f"{all_file_names[net_env.trace_idx]},"  # trace_name
+            f"{trace_name},"                         # trace_name
             f"{time_s},"                             # time_stamp (s)
             f"{VIDEO_BIT_RATE[bit_rate]},"           # chosen bit_rate (kbps)
             f"{buffer_size_s},"
@@ -80,42 +116,162 @@ def run_algorithm(algorithm, all_cooked_time, all_cooked_bw, all_file_names, log
             f"{delay_ms},"
             f"{throughput_kbps}\n"
         )
-        log_file.write(line)
-        log_file.flush()
+
+        if end_of_video:
+            lines.append("\n")
+            return lines
 
         # Decisão do próximo bitrate
         if algorithm == "bb":
             # BB: decide baseado no buffer
-            bit_rate = bb_algo(buffer_size_s, VIDEO_BIT_RATE, DEFAULT_QUALITY, M_IN_K, BMIN)
+            bit_rate = bb_algo(buffer_size_s, VIDEO_BIT_RATE, DEFAULT_QUALITY, M_IN_K, config["bmin"])
         elif algorithm == "stallion":
             latency_s = delay_ms / 1000.0
             algo_instance.update_metrics(throughput_kbps, latency_s)
             bit_rate = algo_instance.select_quality()
 
-        if end_of_video:
-            video_count += 1
-            log_file.write("\n")
-            log_file.close()
 
-            bit_rate = DEFAULT_QUALITY
+def commit_log(lines, log_folder, trace_name):
+    """
+    Grava o log da sessão em PARTIAL_FOLDER (criada pelo run_algorithm) e o
+    move para o destino final (os.replace é atômico): um log em log_folder
+    está sempre completo.
+    """
+    partial_path = log_folder + PARTIAL_FOLDER + LOG_FILE + trace_name
+    log_path = log_folder + LOG_FILE + trace_name
+    with open(partial_path, "w") as log_file:
+        log_file.writelines(lines)
+        log_file.flush()
+        os.fsync(log_file.fileno())
+    os.replace(partial_path, log_path)
+    return log_path
+
+
+# Estado de cada processo worker: pool de traces e um Environment por replicação
+_worker_pool = None
+_worker_envs = {}
+
+
+def _init_worker(manifest):
+    global _worker_pool
+    _worker_pool = TracePool.attach(manifest)
+
+
+def _run_worker_session(job):
+    algorithm, config, trace_idx, trace_name, log_folder, replication = job
+    net_env = _worker_envs.get(replication)
+    if net_env is None:
+        net_env = env.Environment(_worker_pool.all_cooked_time, _worker_pool.all_cooked_bw,
+                                  random_seed=RANDOM_SEED + replication,
+                                  video_size=_worker_pool.video_size)
+        _worker_envs[replication] = net_env
+    lines = run_session(algorithm, config, net_env, trace_idx, trace_name, replication)
+    return trace_name, commit_log(lines, log_folder, trace_name)
+
+
+def run_algorithm(algorithm, all_cooked_time, all_cooked_bw, all_file_names, log_folder,
+                  ledger=None, replication=0, trace_pool=None, workers=1, video_size=None):
+    """
+    Roda uma sessão por trace. Com um ledger, pula as sessões já concluídas
+    e registra cada sessão assim que o seu log é gravado.
+
+    Com workers > 1 as sessões rodam em paralelo; os workers usam as views
+    do trace_pool (TracePool) em vez de copiar os traces.
+    :param video_size: tamanhos de chunk já carregados (None = lê do disco).
+    """
+    print(f"Executando {algorithm} Algorithm")
+
+    log_folder = replication_folder(log_folder, replication)
+    # Criada aqui, antes do pool: os workers só gravam dentro dela
+    if not os.path.exists(log_folder + PARTIAL_FOLDER):
+        os.makedirs(log_folder + PARTIAL_FOLDER)
+
+    config = ALGORITHM_CONFIGS[algorithm]
+    config_id = config_key(config)
+    done = ledger.completed(algorithm, config_id) if ledger is not None else set()
+
+    jobs = [(algorithm, config, trace_idx, trace_name, log_folder, replication)
+            for trace_idx, trace_name in enumerate(all_file_names)
+            if (trace_name, replication) not in done]
+    skipped = len(all_file_names) - len(jobs)
+    if not jobs:
+        print(f"  {skipped} sessões já concluídas (ledger), não executadas novamente")
+        return
+    if ledger is not None:
+        # Os logs a sobrescrever podem estar registrados com outra configuração
+        ledger.release([log_folder + LOG_FILE + trace_name for _, _, _, trace_name, _, _ in jobs])
+
+    if workers > 1 and trace_pool is not None:
+        pool = Pool(processes=workers, initializer=_init_worker, initargs=(trace_pool.manifest,))
+        results = pool.imap_unordered(_run_worker_session, jobs)
+    else:
+        pool = None
+
+        def run_serial():
+            net_env = env.Environment(all_cooked_time=all_cooked_time, all_cooked_bw=all_cooked_bw,
+                                      random_seed=RANDOM_SEED + replication, video_size=video_size)
+            for _, _, trace_idx, trace_name, _, _ in jobs:
+                lines = run_session(algorithm, config, net_env, trace_idx, trace_name, replication)
+                yield trace_name, commit_log(lines, log_folder, trace_name)
+
+        results = run_serial()
+
+    try:
+        # Só o processo pai escreve no ledger
+        for trace_name, log_path in results:
+            if ledger is not None:
+                ledger.mark_done(algorithm, config_id, trace_name, replication, log_path)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
-            # fim total dos traces?
-            if net_env.trace_idx >= len(all_cooked_time):
-                break
-            if video_count >= len(all_file_names):
-                break
+    if skipped:
+        print(f"  {skipped} sessões já concluídas (ledger), não executadas novamente")
 
-            log_path = log_folder + LOG_FILE + all_file_names[net_env.trace_idx]
-            log_file = open(log_path, "w")
 
+def main(traces_folder=TEST_TRACES, log_folders=LOG_FOLDERS, video_size_file=None,
+         trace_selection=TRACE_SELECTION, trace_index=TRACE_INDEX, file_names=None,
+         ledger_path=LEDGER_PATH, replications=REPLICATIONS, workers=WORKERS):
+    """
+    Simula os algoritmos de log_folders (algoritmo -> pasta de logs).
 
-def main():
+    :param trace_selection: filtros do trace_index (ignorado se file_names for dado).
+    :param file_names: nomes dos traces a simular (None = todos).
+    :param ledger_path: ledger para retomar varreduras; None reexecuta tudo.
+    Retorna os nomes dos traces simulados.
+    """
     np.random.seed(RANDOM_SEED)
-    all_cooked_time, all_cooked_bw, all_file_names = load_trace.load_trace(TEST_TRACES)
+    if file_names is None and trace_selection is not None:
+        file_names = TraceIndex.build(traces_folder, trace_index).select(**trace_selection)
+        print(f"{len(file_names)} traces selecionados pelo índice: {trace_selection}")
+    all_cooked_time, all_cooked_bw, all_file_names = load_trace.load_trace(traces_folder, file_names)
+    if file_names is not None:
+        missing = sorted(set(file_names) - set(all_file_names))
+        if missing:
+            print(f"Traces não encontrados em {traces_folder}: {', '.join(missing)}")
+    if not all_file_names:
+        print("0 traces selecionados; nada a simular.")
+        return all_file_names
+    video_size = env.load_video_size(video_size_file)
 
-    run_algorithm("bb", all_cooked_time, all_cooked_bw, all_file_names, BB_LOG_FOLDER)
-    run_algorithm("stallion", all_cooked_time, all_cooked_bw, all_file_names, STALLION_LOG_FOLDER)
-    print("Execução concluída. Logs salvos em:", BB_LOG_FOLDER, "e", STALLION_LOG_FOLDER)
+    ledger = JobLedger(ledger_path) if ledger_path else None
+    trace_pool = None
+    if workers > 1:
+        trace_pool = TracePool.create(all_cooked_time, all_cooked_bw, all_file_names, video_size)
+    try:
+        for replication in range(replications):
+            for algorithm, log_folder in log_folders.items():
+                run_algorithm(algorithm, all_cooked_time, all_cooked_bw, all_file_names, log_folder,
+                              ledger, replication, trace_pool, workers, video_size)
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if trace_pool is not None:
+            trace_pool.close()
+            trace_pool.unlink()
+    print("Execução concluída. Logs salvos em:", " e ".join(log_folders.values()))
+    return all_file_names
 
 if __name__ == "__main__":
     main()
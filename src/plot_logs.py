@@ -1,95 +1,180 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
+from figure_jobs import render_figures
+from trace_index import trace_family
 
 BB_RESULTS_DIR = "/app/results/results_bb"
 STALLION_RESULTS_DIR = "/app/results/results_stallion"
 
-BB_GRAPHS_DIR = "/app/graphs/graphs_bb"
-STALLION_GRAPHS_DIR = "/app/graphs/graphs_stallion"
-
 COMPARATIVE_GRAPHS_DIR = "/app/graphs/graphs_comparative"
+FAMILY_GRAPHS_DIR = "/app/graphs/graphs_families"
+TRACE_GRAPHS_DIR = "/app/graphs/graphs_traces"
+
+RESULTS_DIRS = {"bb": BB_RESULTS_DIR, "stallion": STALLION_RESULTS_DIR}
+ALGORITHM_LABELS = {"bb": "BB", "stallion": "Stallion"}
+FIGURE_WORKERS = None  # processos para renderizar figuras (None = nº de CPUs)
+
+# Mesmo formato (9 colunas) escrito pelo player.py
+LOG_COLUMNS = [
+    "algorithm",
+    "trace_name",
+    "time_stamp",
+    "bit_rate",
+    "buffer_size",
+    "rebuffer_time",
+    "chunk_size",
+    "delay",
+    "throughput",
+]
+LOG_PREFIX = "log_"
+
+# (coluna, rótulo do eixo y) das séries plotadas por trace e por família
+SERIES = [
+    ("bit_rate", "Bitrate (Kbps)"),
+    ("buffer_size", "Buffer Size (s)"),
+    ("cum_rebuffer", "Cumulative Rebuffer Time (s)"),
+]
 
-# Criar diretório para gráficos comparativos
-if not os.path.exists(COMPARATIVE_GRAPHS_DIR):
-    os.makedirs(COMPARATIVE_GRAPHS_DIR)
 
-def load_data(results_dir):
+def load_data(results_dirs=RESULTS_DIRS):
+    """
+    Lê todos os logs em um único DataFrame colunar.
+
+    Colunas extras:
+      - trace_name: nome do trace, tirado do nome do arquivo de log;
+      - family:     família do trace (ex. "norway_bus");
+      - chunk:      índice do chunk dentro da sessão;
+      - session_time: tempo (s) desde o início da sessão;
+      - cum_rebuffer: rebuffer acumulado (s) na sessão.
+    """
+    import pandas as pd  # import tardio: pandas só é carregado por quem lê os logs
     data = []
-    for log_file in os.listdir(results_dir):
-        log_path = os.path.join(results_dir, log_file)
-
-        try:
-            df = pd.read_csv(
-                log_path,
-                names=[
-                    "algorithm",
-                    "time_stamp",
-                    "bit_rate",
-                    "buffer_size",
-                    "rebuffer_time",
-                    "chunk_size",
-                    "download_time",
-                    "throughput",
-                ],
-                sep=",",
-                engine="python",
-            )
-            data.append(df)
-        except Exception as e:
-            print(f"Erro ao ler {log_file}: {e}")
+    for results_dir in results_dirs.values():
+        if not os.path.isdir(results_dir):
             continue
+        for log_file in os.listdir(results_dir):
+            log_path = os.path.join(results_dir, log_file)
+            if not os.path.isfile(log_path):
+                continue
+            try:
+                df = pd.read_csv(log_path, names=LOG_COLUMNS, sep=",")
+            except Exception as e:
+                print(f"Erro ao ler {log_file}: {e}")
+                continue
+            # A sessão é identificada pelo arquivo de log
+            trace_name = log_file[len(LOG_PREFIX):] if log_file.startswith(LOG_PREFIX) else log_file
+            df["trace_name"] = trace_name
+            data.append(df)
+
+    if not data:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+
+    frame = pd.concat(data, ignore_index=True)
+    frame["family"] = frame["trace_name"].map(trace_family)
+
+    sessions = frame.groupby(["algorithm", "trace_name"], sort=False)
+    frame["chunk"] = sessions.cumcount()
+    # Tempo relativo ao primeiro chunk (logs antigos acumulavam time_stamp entre traces)
+    frame["session_time"] = frame["time_stamp"] - sessions["time_stamp"].transform("first")
+    frame["cum_rebuffer"] = sessions["rebuffer_time"].cumsum()
+    return frame
+
+
+def plot_trace_series(trace_name, series_by_alg, out_png):
+    """
+    Séries temporais de um trace: bitrate, buffer e rebuffer acumulado,
+    uma linha por algoritmo.
+
+    :param series_by_alg: dict algoritmo -> dict coluna -> array
+                          (inclui "session_time").
+    """
+    import matplotlib.pyplot as plt
+    fig, axs = plt.subplots(len(SERIES), 1, figsize=(8, 9), sharex=True)
+    for alg, cols in series_by_alg.items():
+        for ax, (col, ylabel) in zip(axs, SERIES):
+            ax.plot(cols["session_time"], cols[col], label=ALGORITHM_LABELS.get(alg, alg))
+            ax.set_ylabel(ylabel)
+    axs[0].set_title(f"{trace_name}: BB vs Stallion")
+    axs[0].legend()
+    axs[-1].set_xlabel("Time (s)")
+    fig.tight_layout()
+    fig.savefig(out_png)
+    plt.close(fig)
+    return [out_png]
+
 
-    return pd.concat(data, ignore_index=True) if data else pd.DataFrame()
-
-def generate_comparative_graphs(bb_data, stallion_data):
-    # Bitrate Comparison
-    plt.figure()
-    plt.plot(bb_data["time_stamp"], bb_data["bit_rate"], label="BB Bitrate (Kbps)")
-    plt.plot(stallion_data["time_stamp"], stallion_data["bit_rate"], label="Stallion Bitrate (Kbps)", linestyle="--")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Bitrate (Kbps)")
-    plt.title("Comparação de Bitrate: BB vs Stallion")
-    plt.legend()
-    plt.savefig(os.path.join(COMPARATIVE_GRAPHS_DIR, "comparative_bitrate.png"))
-    plt.close()
-
-    # Buffer Size Comparison
-    plt.figure()
-    plt.plot(bb_data["time_stamp"], bb_data["buffer_size"], label="BB Buffer Size (s)")
-    plt.plot(stallion_data["time_stamp"], stallion_data["buffer_size"], label="Stallion Buffer Size (s)", linestyle="--")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Buffer Size (s)")
-    plt.title("Comparação de Tamanho do Buffer: BB vs Stallion")
-    plt.legend()
-    plt.savefig(os.path.join(COMPARATIVE_GRAPHS_DIR, "comparative_buffer.png"))
-    plt.close()
-
-    # Rebuffering Comparison
-    plt.figure()
-    plt.plot(bb_data["time_stamp"], bb_data["rebuffer_time"].cumsum(), label="BB Rebuffer Time (s)")
-    plt.plot(stallion_data["time_stamp"], stallion_data["rebuffer_time"].cumsum(), label="Stallion Rebuffer Time (s)", linestyle="--")
-    plt.xlabel("Time (s)")
-    plt.ylabel("Cumulative Rebuffer Time (s)")
-    plt.title("Comparação de Rebuffering: BB vs Stallion")
-    plt.legend()
-    plt.savefig(os.path.join(COMPARATIVE_GRAPHS_DIR, "comparative_rebuffering.png"))
-    plt.close()
-
-def main():
-    print("Carregando dados do Buffer-Based Algorithm...")
-    bb_data = load_data(BB_RESULTS_DIR)
-
-    print("Carregando dados do Stallion Algorithm...")
-    stallion_data = load_data(STALLION_RESULTS_DIR)
-
-    if bb_data.empty or stallion_data.empty:
+def plot_group_summary(group_name, series_by_alg, out_png):
+    """
+    Média por chunk (entre os traces do grupo) de bitrate, buffer e
+    rebuffer acumulado, uma linha por algoritmo.
+
+    :param series_by_alg: dict algoritmo -> dict coluna -> array
+                          (inclui "chunk").
+    """
+    import matplotlib.pyplot as plt
+    fig, axs = plt.subplots(len(SERIES), 1, figsize=(8, 9), sharex=True)
+    for alg, cols in series_by_alg.items():
+        for ax, (col, ylabel) in zip(axs, SERIES):
+            ax.plot(cols["chunk"], cols[col], label=ALGORITHM_LABELS.get(alg, alg))
+            ax.set_ylabel(ylabel)
+    axs[0].set_title(f"Média por chunk - {group_name}: BB vs Stallion")
+    axs[0].legend()
+    axs[-1].set_xlabel("Chunk")
+    fig.tight_layout()
+    fig.savefig(out_png)
+    plt.close(fig)
+    return [out_png]
+
+
+def _series_by_alg(frame, x_col):
+    cols = [x_col] + [col for col, _ in SERIES]
+    return {
+        alg: {col: group[col].to_numpy() for col in cols}
+        for alg, group in frame.groupby("algorithm", sort=True)
+    }
+
+
+def _mean_by_chunk(frame):
+    return frame.groupby(["algorithm", "chunk"], as_index=False)[[col for col, _ in SERIES]].mean()
+
+
+def build_jobs(frame, comparative_dir=COMPARATIVE_GRAPHS_DIR, family_dir=FAMILY_GRAPHS_DIR,
+               trace_dir=TRACE_GRAPHS_DIR):
+    """Monta os jobs de figura por trace, por família e o comparativo geral."""
+    jobs = []
+    for trace_name, group in frame.groupby("trace_name", sort=True):
+        out_png = os.path.join(trace_dir, f"{trace_name}.png")
+        jobs.append((f"trace/{trace_name}", plot_trace_series,
+                     (trace_name, _series_by_alg(group, "session_time"), out_png)))
+
+    for family, group in frame.groupby("family", sort=True):
+        out_png = os.path.join(family_dir, f"{family}.png")
+        jobs.append((f"family/{family}", plot_group_summary,
+                     (family, _series_by_alg(_mean_by_chunk(group), "chunk"), out_png)))
+
+    out_png = os.path.join(comparative_dir, "comparative_per_chunk.png")
+    jobs.append(("overall", plot_group_summary,
+                 ("Todos os traces", _series_by_alg(_mean_by_chunk(frame), "chunk"), out_png)))
+    return jobs
+
+
+def main(results_dirs=RESULTS_DIRS, comparative_dir=COMPARATIVE_GRAPHS_DIR,
+         family_dir=FAMILY_GRAPHS_DIR, trace_dir=TRACE_GRAPHS_DIR, workers=FIGURE_WORKERS):
+    print("Carregando logs do BB e do Stallion...")
+    frame = load_data(results_dirs)
+
+    if frame.empty or frame["algorithm"].nunique() < 2:
         print("Dados insuficientes para gerar gráficos comparativos.")
         return
 
+    for graphs_dir in [comparative_dir, family_dir, trace_dir]:
+        if not os.path.exists(graphs_dir):
+            os.makedirs(graphs_dir)
+
     print("Gerando gráficos comparativos...")
-    generate_comparative_graphs(bb_data, stallion_data)
-    print("Gráficos comparativos gerados com sucesso em 'graphs_comparative'.")
+    jobs = build_jobs(frame, comparative_dir, family_dir, trace_dir)
+    rendered, skipped = render_figures(jobs, os.path.dirname(comparative_dir), workers=workers)
+    print(f"Gráficos gerados: {rendered} (sem alteração: {skipped}).")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,283 @@
+"""
+Armazenamento consultável dos resultados (SQLite), indexado por run,
+algoritmo, configuração, trace e família.
+
+Cada sessão (um log) vira uma linha com as mesmas métricas do
+family_comparison.csv (bitrate médio, stall total, trocas, latência média).
+Ao contrário do CSV, os runs anteriores ficam guardados e podem ser
+comparados por consulta:
+
+    store = ResultsStore()
+    store.ingest_logs("baseline", "bb", "/app/results/results_bb")
+    rows = store.query(run_id="baseline", family="norway_bus")
+    report = store.diff("baseline", "candidate")
+
+O diff pareia as sessões pelo mesmo (trace, replicação) e usa o teste dos
+postos sinalizados de Wilcoxon (aproximação normal) para a significância.
+"""
+import os
+import math
+import time
+import sqlite3
+
+from compute_metrics import session_metrics
+
+RESULTS_DB = "/app/results/results.sqlite"
+LOG_PREFIX = "log_"
+REPLICATION_PREFIX = "rep_"
+METRICS = ["avg_bitrate", "total_stall", "switches", "avg_delay"]
+
+
+def wilcoxon_signed_rank(diffs):
+    """
+    Teste dos postos sinalizados de Wilcoxon (bilateral), com aproximação
+    normal, correção de empates e de continuidade.
+    Retorna o p-valor (1.0 se não houver diferenças não nulas).
+    """
+    diffs = [d for d in diffs if d != 0]
+    n = len(diffs)
+    if n == 0:
+        return 1.0
+
+    # Postos de |d| com média nos empates
+    order = sorted(range(n), key=lambda i: abs(diffs[i]))
+    ranks = [0.0] * n
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and abs(diffs[order[j + 1]]) == abs(diffs[order[i]]):
+            j += 1
+        avg_rank = (i + j) / 2.0 + 1.0
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg_rank
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+
+    w_plus = sum(r for r, d in zip(ranks, diffs) if d > 0)
+    mean = n * (n + 1) / 4.0
+    var = n * (n + 1) * (2 * n + 1) / 24.0 - tie_term / 48.0
+    if var <= 0:
+        return 1.0
+    z = (abs(w_plus - mean) - 0.5) / math.sqrt(var)
+    return math.erfc(max(z, 0.0) / math.sqrt(2.0))
+
+
+def log_sessions(log_folder):
+    """
+    Logs de log_folder (replicação 0) e das subpastas rep_<k>.
+    Retorna uma lista de (trace, replication, log_path).
+    """
+    folders = [(log_folder, 0)]
+    for entry in sorted(os.listdir(log_folder)):
+        if entry.startswith(REPLICATION_PREFIX) and os.path.isdir(os.path.join(log_folder, entry)):
+            folders.append((os.path.join(log_folder, entry), int(entry[len(REPLICATION_PREFIX):])))
+
+    sessions = []
+    for folder, replication in folders:
+        for log_file in sorted(os.listdir(folder)):
+            log_path = os.path.join(folder, log_file)
+            if log_file.startswith(LOG_PREFIX) and os.path.isfile(log_path):
+                sessions.append((log_file[len(LOG_PREFIX):], replication, log_path))
+    return sessions
+
+
+class ResultsStore:
+    def __init__(self, path=RESULTS_DB):
+        out_dir = os.path.dirname(path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " note TEXT NOT NULL DEFAULT '');"
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " run_id TEXT NOT NULL REFERENCES runs(run_id),"
+            " algorithm TEXT NOT NULL,"
+            " config TEXT NOT NULL,"
+            " trace TEXT NOT NULL,"
+            " family TEXT NOT NULL,"
+            " replication INTEGER NOT NULL,"
+            " n_chunks INTEGER NOT NULL,"
+            " avg_bitrate REAL NOT NULL,"
+            " total_stall REAL NOT NULL,"
+            " switches INTEGER NOT NULL,"
+            " avg_delay REAL NOT NULL,"
+            " PRIMARY KEY (run_id, algorithm, config, trace, replication));"
+            # O pareamento do diff usa a chave primária
+            "CREATE INDEX IF NOT EXISTS sessions_family"
+            " ON sessions (run_id, algorithm, family);"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _save_run(self, run_id, note):
+        # Sem transação própria: chamado dentro de add_run e de ingest_logs
+        self.conn.execute(
+            "INSERT OR IGNORE INTO runs (run_id, created_at, note) VALUES (?, ?, ?)",
+            (run_id, time.time(), note),
+        )
+        if note:
+            self.conn.execute("UPDATE runs SET note = ? WHERE run_id = ?", (note, run_id))
+
+    def add_run(self, run_id, note=""):
+        """Registra o run (uma nota não vazia substitui a anterior)."""
+        with self.conn:
+            self._save_run(run_id, note)
+
+    def runs(self):
+        return [dict(row) for row in self.conn.execute("SELECT * FROM runs ORDER BY created_at")]
+
+    def ingest_sessions(self, run_id, algorithm, sessions, note=""):
+        """
+        Grava uma linha por sessão a partir dos logs.
+
+        :param sessions: lista de (config, trace, replication, log_path),
+                         p.ex. JobLedger.sessions() ou log_sessions().
+        Reingerir substitui todas as sessões do algoritmo no run (e a nota,
+        se dada). Retorna o número de sessões gravadas.
+        """
+        rows = []
+        for config, trace, replication, log_path in sessions:
+            session = session_metrics(log_path)
+            if session is None:
+                continue
+            family_name, metrics, sketches = session
+            rows.append((
+                run_id, algorithm, config, trace, family_name, replication,
+                sketches["delay"].count, float(metrics["bitrate"]), float(metrics["total_stall"]),
+                int(metrics["switches"]), float(metrics["delay"]),
+            ))
+
+        with self.conn:
+            self._save_run(run_id, note)
+            self.conn.execute("DELETE FROM sessions WHERE run_id = ? AND algorithm = ?",
+                              (run_id, algorithm))
+            self.conn.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def ingest_logs(self, run_id, algorithm, log_folder, config="", note=""):
+        """
+        Grava todos os logs de log_folder (e das subpastas rep_<k>), todos
+        com a mesma config. Ver ingest_sessions.
+        """
+        sessions = [(config, trace, replication, log_path)
+                    for trace, replication, log_path in log_sessions(log_folder)]
+        return self.ingest_sessions(run_id, algorithm, sessions, note)
+
+    def query(self, run_id=None, algorithm=None, config=None, family=None, trace=None):
+        """Sessões filtradas pelos campos informados (lista de dicts)."""
+        filters = {"run_id": run_id, "algorithm": algorithm, "config": config,
+                   "family": family, "trace": trace}
+        where = [f"{field} = ?" for field, value in filters.items() if value is not None]
+        params = [value for value in filters.values() if value is not None]
+        sql = "SELECT * FROM sessions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY run_id, algorithm, family, trace, replication"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def family_summary(self, run_id, algorithm=None):
+        """Médias por família e algoritmo de um run (como o family_comparison.csv)."""
+        sql = ("SELECT family, algorithm, COUNT(*) AS sessions,"
+               " AVG(avg_bitrate) AS avg_bitrate, AVG(total_stall) AS avg_stall,"
+               " SUM(switches) AS total_switches, AVG(avg_delay) AS avg_latency"
+               " FROM sessions WHERE run_id = ?")
+        params = [run_id]
+        if algorithm is not None:
+            sql += " AND algorithm = ?"
+            params.append(algorithm)
+        sql += " GROUP BY family, algorithm ORDER BY family, algorithm"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def _configs(self, run_id, algorithm, config=None):
+        """Configurações de algorithm registradas no run (ou só config, se dada)."""
+        sql = "SELECT DISTINCT config FROM sessions WHERE run_id = ? AND algorithm = ?"
+        params = [run_id, algorithm]
+        if config is not None:
+            sql += " AND config = ?"
+            params.append(config)
+        return [row["config"] for row in self.conn.execute(sql + " ORDER BY config", params)]
+
+    def _paired(self, run_a, algorithm_a, config_a, run_b, algorithm_b, config_b):
+        """Sessões dos dois lados pareadas por (trace, replicação)."""
+        sql = (
+            "SELECT a.family AS family,"
+            + ",".join(f" a.{m} AS a_{m}, b.{m} AS b_{m}" for m in METRICS)
+            + " FROM sessions a JOIN sessions b"
+            " ON a.trace = b.trace AND a.replication = b.replication"
+            " WHERE a.run_id = ? AND a.algorithm = ? AND a.config = ?"
+            " AND b.run_id = ? AND b.algorithm = ? AND b.config = ?"
+        )
+        params = (run_a, algorithm_a, config_a, run_b, algorithm_b, config_b)
+        return self.conn.execute(sql, params).fetchall()
+
+    def diff(self, run_a, run_b, algorithm_a=None, algorithm_b=None, config_a=None, config_b=None):
+        """
+        Compara dois runs por família e métrica.
+
+        Sem algoritmos explícitos, compara cada algoritmo presente nos dois
+        runs com ele mesmo; com algorithm_a/algorithm_b, compara esse par
+        (p.ex. candidato vs. baseline no mesmo run). Cada combinação de
+        configurações (config_a, config_b) é comparada separadamente;
+        config_a/config_b restringem a comparação a uma configuração.
+        Retorna uma lista de dicts: family, algorithm, config_a, config_b,
+        metric, n, mean_a, mean_b, delta (b - a) e p_value. A família
+        "overall" junta todas.
+        """
+        if algorithm_a is None and algorithm_b is None:
+            algs_a = {row["algorithm"] for row in self.conn.execute(
+                "SELECT DISTINCT algorithm FROM sessions WHERE run_id = ?", (run_a,))}
+            algs_b = {row["algorithm"] for row in self.conn.execute(
+                "SELECT DISTINCT algorithm FROM sessions WHERE run_id = ?", (run_b,))}
+            pairs = [(alg, alg) for alg in sorted(algs_a & algs_b)]
+        else:
+            pairs = [(algorithm_a or algorithm_b, algorithm_b or algorithm_a)]
+
+        comparisons = [
+            (alg_a, cfg_a, alg_b, cfg_b)
+            for alg_a, alg_b in pairs
+            for cfg_a in self._configs(run_a, alg_a, config_a)
+            for cfg_b in self._configs(run_b, alg_b, config_b)
+        ]
+
+        report = []
+        for alg_a, cfg_a, alg_b, cfg_b in comparisons:
+            rows = self._paired(run_a, alg_a, cfg_a, run_b, alg_b, cfg_b)
+            groups = {}
+            for row in rows:
+                groups.setdefault(row["family"], []).append(row)
+            groups["overall"] = rows
+
+            label = alg_a if alg_a == alg_b else f"{alg_a}->{alg_b}"
+            for family in sorted(groups, key=lambda fam: (fam == "overall", fam)):
+                group = groups[family]
+                if not group:
+                    continue
+                for metric in METRICS:
+                    values_a = [row[f"a_{metric}"] for row in group]
+                    values_b = [row[f"b_{metric}"] for row in group]
+                    mean_a = sum(values_a) / len(values_a)
+                    mean_b = sum(values_b) / len(values_b)
+                    report.append({
+                        "family": family,
+                        "algorithm": label,
+                        "config_a": cfg_a,
+                        "config_b": cfg_b,
+                        "metric": metric,
+                        "n": len(group),
+                        "mean_a": mean_a,
+                        "mean_b": mean_b,
+                        "delta": mean_b - mean_a,
+                        "p_value": wilcoxon_signed_rank([b - a for a, b in zip(values_a, values_b)]),
+                    })
+        return report
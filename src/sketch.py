@@ -0,0 +1,106 @@
+"""
+Sketch de quantis em streaming, mesclável e com memória limitada.
+
+Segue a ideia do DDSketch: cada valor positivo cai em um balde logarítmico
+de índice ceil(log_gamma(x)), com gamma = (1 + a) / (1 - a). Os quantis
+estimados têm erro relativo de no máximo 'a' (relative_accuracy), e o número
+de baldes cresce apenas com log(max / min), não com o número de amostras.
+
+Sketches com a mesma precisão podem ser somados (merge), então cada sessão
+(ou processo) mantém o seu e eles são combinados por trace, família, etc.
+Valores <= 0 (p.ex. rebuffer nulo, o caso mais comum) ficam em um balde
+próprio e são estimados como 0.
+"""
+import math
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+MIN_POSITIVE = 1e-9  # abaixo disso o valor conta como zero
+
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        """
+        :param relative_accuracy: erro relativo máximo dos quantis (ex. 0.01 = 1%).
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+
+        self.bins = {}  # índice do balde -> contagem
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.update([value])
+
+    def update(self, values):
+        """Adiciona um lote de valores (vetorizado)."""
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > MIN_POSITIVE]
+        self.zero_count += int(values.size - positive.size)
+        if positive.size:
+            idx = np.ceil(np.log(positive) / self.log_gamma).astype(np.int64)
+            keys, counts = np.unique(idx, return_counts=True)
+            for key, n in zip(keys.tolist(), counts.tolist()):
+                self.bins[key] = self.bins.get(key, 0) + n
+
+    def merge(self, other):
+        """Soma 'other' a este sketch (mesma precisão). Retorna self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Sketches com precisões diferentes não podem ser mesclados")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q):
+        """
+        Estimativa do quantil q (0..1). Retorna 0.0 se o sketch estiver vazio.
+        """
+        if self.count == 0:
+            return 0.0
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                value = 2.0 * self.gamma ** key / (self.gamma + 1.0)
+                # A estimativa nunca sai do intervalo observado
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+def merge_sketches(sketches):
+    """Mescla uma sequência de sketches em um novo sketch."""
+    merged = None
+    for sketch in sketches:
+        if merged is None:
+            merged = QuantileSketch(sketch.relative_accuracy)
+        merged.merge(sketch)
+    return merged if merged is not None else QuantileSketch()
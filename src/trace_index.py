@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Índice de traces com estatísticas pré-computadas.
+
+O índice é construído uma vez (e salvo em CSV) com estatísticas de banda de
+cada trace, permitindo selecionar ou estratificar traces antes de carregá-los
+ou simulá-los, p.ex.:
+
+    index = TraceIndex.build("/app/traces/")
+    hard = index.select(max_p10=1.0)       # traces com p10 <= 1 Mbps
+    names = index.select(families=["norway_bus"], min_outage_fraction=0.05)
+    all_cooked_time, all_cooked_bw, all_file_names = load_trace.load_trace(
+        "/app/traces/", file_names=hard)
+
+Na reconstrução, só são relidos os traces novos ou alterados (mtime/tamanho).
+"""
+import os
+import csv
+import argparse
+
+import numpy as np
+
+import load_trace
+
+INDEX_PATH = "/app/results/trace_index.csv"
+OUTAGE_THRESHOLD = 0.1  # Mbps, abaixo disso a amostra conta como queda
+PERCENTILES = [10, 50, 90]
+
+STAT_FIELDS = ["n_samples", "duration", "mean", "var", "std", "min", "max",
+               "p10", "p50", "p90", "outage_fraction"]
+FIELDS = ["trace_name", "family", "file_name", "mtime", "size"] + STAT_FIELDS
+
+
+def trace_family(trace_name):
+    """Identifica a "família": ex. "norway_car_2" => "norway_car"."""
+    parts = trace_name.rsplit("_", 1)
+    if len(parts) == 2:
+        return parts[0]
+    return trace_name
+
+
+def trace_stats(cooked_time, cooked_bw):
+    """
+    Estatísticas (por amostra) da banda de um trace, em Mbps.
+    'duration' é em segundos.
+    """
+    bw = np.asarray(cooked_bw, dtype=float)
+    if bw.size == 0:
+        return {field: 0.0 for field in STAT_FIELDS}
+    p10, p50, p90 = np.percentile(bw, PERCENTILES)
+    return {
+        "n_samples": int(bw.size),
+        "duration": float(cooked_time[-1] - cooked_time[0]),
+        "mean": float(bw.mean()),
+        "var": float(bw.var()),
+        "std": float(bw.std()),
+        "min": float(bw.min()),
+        "max": float(bw.max()),
+        "p10": float(p10),
+        "p50": float(p50),
+        "p90": float(p90),
+        "outage_fraction": float(np.mean(bw < OUTAGE_THRESHOLD)),
+    }
+
+
+class TraceIndex:
+    def __init__(self, entries=None):
+        """
+        :param entries: dict trace_name -> linha do índice (dict com FIELDS).
+        """
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, trace_name):
+        return self.entries[trace_name]
+
+    @classmethod
+    def load(cls, index_path=INDEX_PATH):
+        entries = {}
+        with open(index_path, "r") as f:
+            for row in csv.DictReader(f):
+                for field in ["mtime"] + STAT_FIELDS:
+                    row[field] = float(row[field])
+                for field in ["size", "n_samples"]:
+                    row[field] = int(float(row[field]))
+                entries[row["trace_name"]] = row
+        return cls(entries)
+
+    def save(self, index_path=INDEX_PATH):
+        out_dir = os.path.dirname(index_path)
+        if out_dir and not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        with open(index_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            for name in sorted(self.entries):
+                writer.writerow(self.entries[name])
+
+    @classmethod
+    def build(cls, cooked_trace_folder=load_trace.COOKED_TRACE_FOLDER, index_path=INDEX_PATH):
+        """
+        Constrói (ou atualiza) o índice dos traces em cooked_trace_folder.
+        Se index_path existir, reaproveita as entradas cujos arquivos não mudaram.
+        Com index_path=None o índice não é persistido.
+        """
+        cached = {}
+        if index_path and os.path.exists(index_path):
+            cached = cls.load(index_path).entries
+
+        entries = {}
+        changed = False
+        for cooked_file in sorted(os.listdir(cooked_trace_folder)):
+            file_path = os.path.join(cooked_trace_folder, cooked_file)
+            if not os.path.isfile(file_path):
+                continue
+            st = os.stat(file_path)
+            name = load_trace.trace_name(cooked_file)
+            old = cached.get(name)
+            if (old is not None and old["file_name"] == cooked_file
+                    and old["size"] == st.st_size and old["mtime"] == st.st_mtime):
+                entries[name] = old
+                continue
+
+            cooked_time, cooked_bw = load_trace.read_trace(file_path)
+            row = {
+                "trace_name": name,
+                "family": trace_family(name),
+                "file_name": cooked_file,
+                "mtime": st.st_mtime,
+                "size": st.st_size,
+            }
+            row.update(trace_stats(cooked_time, cooked_bw))
+            entries[name] = row
+            changed = True
+
+        index = cls(entries)
+        if index_path and (changed or set(entries) != set(cached)):
+            index.save(index_path)
+        return index
+
+    def select(self, families=None, where=None, **bounds):
+        """
+        Seleciona traces pelo índice, sem carregá-los.
+
+        :param families: lista de famílias aceitas (None = todas).
+        :param where: função opcional row -> bool para filtros arbitrários.
+        :param bounds: limites inclusivos min_<estatística>/max_<estatística>,
+                       p.ex. max_p10=1.0, min_duration=300.
+        Retorna a lista ordenada com os nomes dos traces selecionados.
+        """
+        limits = []
+        for key, value in bounds.items():
+            kind, _, field = key.partition("_")
+            if kind not in ("min", "max") or field not in STAT_FIELDS:
+                raise ValueError(f"Filtro desconhecido: {key}")
+            limits.append((kind, field, value))
+
+        selected = []
+        for name in sorted(self.entries):
+            row = self.entries[name]
+            if families is not None and row["family"] not in families:
+                continue
+            if any((row[field] < value) if kind == "min" else (row[field] > value)
+                   for kind, field, value in limits):
+                continue
+            if where is not None and not where(row):
+                continue
+            selected.append(name)
+        return selected
+
+    def stratify(self, field, edges, names=None):
+        """
+        Agrupa traces em faixas da estatística 'field' delimitadas por 'edges'.
+
+        Retorna dict (low, high) -> lista de nomes, com faixas abertas
+        nas pontas (-inf, edges[0]) e (edges[-1], inf).
+        """
+        if field not in STAT_FIELDS:
+            raise ValueError(f"Estatística desconhecida: {field}")
+        if names is None:
+            names = sorted(self.entries)
+        bounds = [-np.inf] + list(edges) + [np.inf]
+        strata = {(bounds[i], bounds[i + 1]): [] for i in range(len(bounds) - 1)}
+        values = np.array([self.entries[name][field] for name in names], dtype=float)
+        bins = np.digitize(values, edges)
+        for name, b in zip(names, bins):
+            strata[(bounds[b], bounds[b + 1])].append(name)
+        return strata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Constrói o índice de traces.")
+    parser.add_argument("--traces", default=load_trace.COOKED_TRACE_FOLDER)
+    parser.add_argument("--index", default=INDEX_PATH)
+    args = parser.parse_args()
+
+    index = TraceIndex.build(args.traces, args.index)
+    families = sorted(set(row["family"] for row in index.entries.values()))
+    print(f"{len(index)} traces indexados em: {args.index}")
+    for fam in families:
+        names = index.select(families=[fam])
+        p10 = [index[name]["p10"] for name in names]
+        print(f"  {fam}: {len(names)} traces, p10 médio={np.mean(p10):.2f} Mbps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Pool de traces e tamanhos de chunk em memória compartilhada.
+
+O processo pai carrega os traces uma única vez e os copia para um bloco
+multiprocessing.shared_memory; os workers se conectam pelo nome (manifesto
+pequeno e "picklable") e recebem views NumPy sem cópia. Assim a
+inicialização de cada worker é imediata (sem reler traces nem os arquivos
+video_size_*) e a memória residente não cresce com o número de workers.
+
+    pool = TracePool.create(all_cooked_time, all_cooked_bw, all_file_names,
+                            fixed_env.load_video_size())
+    ...  # workers: TracePool.attach(pool.manifest)
+    pool.close()
+    pool.unlink()
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class TracePool:
+    def __init__(self, manifest, shm):
+        self.manifest = manifest
+        self.shm = shm
+        self.file_names = manifest["file_names"]
+
+        n_traces = len(self.file_names)
+        total = manifest["total_samples"]
+        n_levels, n_chunks = manifest["video_shape"]
+
+        buf = shm.buf
+        offset = 0
+        self.offsets = np.ndarray((n_traces + 1,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.offsets.nbytes
+        self.times = np.ndarray((total,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.times.nbytes
+        self.bws = np.ndarray((total,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.bws.nbytes
+        self.video_size = np.ndarray((n_levels, n_chunks), dtype=np.int64, buffer=buf, offset=offset)
+        self._split_traces()
+
+    def _split_traces(self):
+        # Views por trace (sem cópia), no formato esperado pelo Environment
+        bounds = self.offsets.tolist()
+        self.all_cooked_time = [self.times[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self.all_cooked_bw = [self.bws[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+    @staticmethod
+    def _size(n_traces, total, video_shape):
+        return 8 * (n_traces + 1) + 2 * 8 * total + 8 * video_shape[0] * video_shape[1]
+
+    @classmethod
+    def create(cls, all_cooked_time, all_cooked_bw, all_file_names, video_size):
+        """
+        Cria o bloco compartilhado (processo pai).
+
+        :param video_size: tamanhos de chunk, video_size[bitrate][chunk]
+                           (p.ex. fixed_env.load_video_size()).
+        """
+        lengths = [len(t) for t in all_cooked_time]
+        video_matrix = np.array([video_size[b] for b in range(len(video_size))], dtype=np.int64)
+        manifest = {
+            "file_names": list(all_file_names),
+            "total_samples": int(sum(lengths)),
+            "video_shape": video_matrix.shape,
+        }
+        shm = shared_memory.SharedMemory(
+            create=True,
+            size=max(1, cls._size(len(lengths), manifest["total_samples"], video_matrix.shape)),
+        )
+        manifest["shm_name"] = shm.name
+
+        pool = cls(manifest, shm)
+        pool.offsets[0] = 0
+        np.cumsum(lengths, out=pool.offsets[1:])
+        pool._split_traces()
+        for i, (cooked_time, cooked_bw) in enumerate(zip(all_cooked_time, all_cooked_bw)):
+            pool.all_cooked_time[i][:] = cooked_time
+            pool.all_cooked_bw[i][:] = cooked_bw
+        pool.video_size[:] = video_matrix
+        return pool
+
+    @classmethod
+    def attach(cls, manifest):
+        """Conecta a um pool existente pelo manifesto (processo worker)."""
+        return cls(manifest, shared_memory.SharedMemory(name=manifest["shm_name"]))
+
+    def close(self):
+        # As views precisam ser liberadas antes de fechar o buffer
+        self.all_cooked_time = self.all_cooked_bw = None
+        self.offsets = self.times = self.bws = self.video_size = None
+        self.shm.close()
+
+    def unlink(self):
+        """Remove o bloco compartilhado (apenas o processo pai)."""
+        self.shm.unlink()
@@ -0,0 +1,219 @@
+"""
+Ambiente vetorizado, no estilo Gym, para treinar políticas de ABR
+aprendidas (estilo Pensieve) sobre o fixed_env.Environment.
+
+    venv = VecEnvironment(all_cooked_time, all_cooked_bw, num_envs=16)
+    obs = venv.reset()                              # (16, S_INFO, S_LEN)
+    obs, rewards, dones, infos = venv.step(actions) # actions: (16,) índices
+
+Cada sub-ambiente começa em um trace diferente e, ao fim de um vídeo, passa
+ao próximo trace e já devolve a primeira observação do novo episódio
+(auto-reset). As observações são escritas em arrays pré-alocados; o
+SubprocVecEnvironment distribui os sub-ambientes entre processos, com
+observações, ações e recompensas em memória compartilhada.
+"""
+from multiprocessing import Pipe, Process, shared_memory
+
+import numpy as np
+
+import fixed_env as env
+
+VIDEO_BIT_RATE = [300, 750, 1200, 1850, 2850, 4300]  # kbps
+M_IN_K = 1000.0
+DEFAULT_QUALITY = 1
+RANDOM_SEED = 42
+
+# Observação: S_INFO linhas com histórico de S_LEN chunks
+S_INFO = 6  # bitrate, buffer, throughput, delay, próximos tamanhos, chunks restantes
+S_LEN = 8
+BUFFER_NORM_FACTOR = 10.0
+CHUNK_TIL_VIDEO_END_CAP = float(env.TOTAL_VIDEO_CHUNCK)
+
+# Recompensa: QoE linear (bitrate - penalidade de rebuffer - penalidade de troca)
+REBUF_PENALTY = 4.3  # 1 s de rebuffer ~ perda de 4.3 Mbps
+SMOOTH_PENALTY = 1.0
+
+
+class VecEnvironment:
+    def __init__(self, all_cooked_time, all_cooked_bw, num_envs=1, random_seed=RANDOM_SEED,
+                 obs=None, rewards=None, dones=None, first_env=0):
+        """
+        :param num_envs: número de sub-ambientes.
+        :param obs, rewards, dones: arrays opcionais (p.ex. em memória
+            compartilhada) com shape (num_envs, S_INFO, S_LEN), (num_envs,)
+            e (num_envs,) onde os resultados são escritos.
+        :param first_env: índice global do primeiro sub-ambiente (define o
+            trace inicial de cada um quando os ambientes são divididos).
+        """
+        self.num_envs = num_envs
+        self.obs = obs if obs is not None else np.zeros((num_envs, S_INFO, S_LEN), dtype=np.float32)
+        self.rewards = rewards if rewards is not None else np.zeros(num_envs)
+        self.dones = dones if dones is not None else np.zeros(num_envs, dtype=bool)
+
+        n_traces = len(all_cooked_time)
+        self.start_traces = [(first_env + i) % n_traces for i in range(num_envs)]
+        video_size = env.load_video_size()  # lido uma vez para todos os sub-ambientes
+        self.envs = [
+            env.Environment(all_cooked_time, all_cooked_bw, random_seed=random_seed + first_env + i,
+                            video_size=video_size)
+            for i in range(num_envs)
+        ]
+        self.last_bit_rate = np.full(num_envs, DEFAULT_QUALITY, dtype=np.int64)
+
+    def _observe(self, i, bit_rate, delay, buffer_size, video_chunk_size,
+                 next_video_chunk_sizes, video_chunk_remain):
+        state = self.obs[i]
+        # Desloca o histórico uma posição para a esquerda (no próprio buffer)
+        state[:, :-1] = state[:, 1:]
+        state[0, -1] = VIDEO_BIT_RATE[bit_rate] / float(np.max(VIDEO_BIT_RATE))
+        state[1, -1] = buffer_size / BUFFER_NORM_FACTOR
+        state[2, -1] = float(video_chunk_size) / float(delay) / M_IN_K  # MB/s
+        state[3, -1] = float(delay) / M_IN_K / BUFFER_NORM_FACTOR
+        state[4, :env.BITRATE_LEVELS] = np.array(next_video_chunk_sizes) / M_IN_K / M_IN_K  # MB
+        state[5, -1] = min(video_chunk_remain, CHUNK_TIL_VIDEO_END_CAP) / CHUNK_TIL_VIDEO_END_CAP
+
+    def _start_episode(self, i):
+        """Zera o histórico e baixa o primeiro chunk na qualidade padrão."""
+        self.obs[i] = 0.0
+        self.last_bit_rate[i] = DEFAULT_QUALITY
+        (delay, _, buffer_size, _, video_chunk_size, next_video_chunk_sizes,
+         _, video_chunk_remain, _) = self.envs[i].get_video_chunk(DEFAULT_QUALITY)
+        self._observe(i, DEFAULT_QUALITY, delay, buffer_size, video_chunk_size,
+                      next_video_chunk_sizes, video_chunk_remain)
+
+    def reset(self):
+        """Reinicia todos os sub-ambientes nos seus traces iniciais. Retorna obs."""
+        for i, sub_env in enumerate(self.envs):
+            sub_env.reset(self.start_traces[i])
+            self._start_episode(i)
+        self.rewards[:] = 0.0
+        self.dones[:] = False
+        return self.obs
+
+    def step(self, actions):
+        """
+        Aplica um índice de bitrate por sub-ambiente.
+
+        Retorna (obs, rewards, dones, infos). obs, rewards e dones são os
+        buffers internos, sobrescritos no próximo step.
+        """
+        infos = []
+        for i, sub_env in enumerate(self.envs):
+            bit_rate = int(actions[i])
+            # No último chunk o Environment já avança para o próximo trace
+            trace_idx = sub_env.trace_idx
+            (delay, sleep_time, buffer_size, rebuf, video_chunk_size, next_video_chunk_sizes,
+             end_of_video, video_chunk_remain, _) = sub_env.get_video_chunk(bit_rate)
+
+            last_bit_rate = self.last_bit_rate[i]
+            self.rewards[i] = (
+                VIDEO_BIT_RATE[bit_rate] / M_IN_K
+                - REBUF_PENALTY * rebuf
+                - SMOOTH_PENALTY * abs(VIDEO_BIT_RATE[bit_rate] - VIDEO_BIT_RATE[last_bit_rate]) / M_IN_K
+            )
+            self.dones[i] = end_of_video
+            infos.append({"rebuf": rebuf, "delay": delay, "trace_idx": trace_idx})
+
+            if end_of_video:
+                # O Environment já passou para o próximo trace
+                self._start_episode(i)
+            else:
+                self.last_bit_rate[i] = bit_rate
+                self._observe(i, bit_rate, delay, buffer_size, video_chunk_size,
+                              next_video_chunk_sizes, video_chunk_remain)
+        return self.obs, self.rewards, self.dones, infos
+
+
+def _shared_array(shm, shape, dtype, offset):
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+    return array, offset + array.nbytes
+
+
+def _buffers(shm, num_envs):
+    """Layout dos arrays dentro do bloco de memória compartilhada."""
+    offset = 0
+    obs, offset = _shared_array(shm, (num_envs, S_INFO, S_LEN), np.float32, offset)
+    rewards, offset = _shared_array(shm, (num_envs,), np.float64, offset)
+    actions, offset = _shared_array(shm, (num_envs,), np.int64, offset)
+    dones, offset = _shared_array(shm, (num_envs,), np.bool_, offset)
+    return obs, rewards, actions, dones
+
+
+def _buffers_size(num_envs):
+    return num_envs * (S_INFO * S_LEN * 4 + 8 + 8 + 1)
+
+
+def _worker(conn, shm_name, num_envs, lo, hi, all_cooked_time, all_cooked_bw, random_seed):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        obs, rewards, actions, dones = _buffers(shm, num_envs)
+        venv = VecEnvironment(all_cooked_time, all_cooked_bw, num_envs=hi - lo,
+                              random_seed=random_seed, obs=obs[lo:hi], rewards=rewards[lo:hi],
+                              dones=dones[lo:hi], first_env=lo)
+        while True:
+            cmd = conn.recv()
+            if cmd == "step":
+                _, _, _, infos = venv.step(actions[lo:hi])
+                conn.send(infos)
+            elif cmd == "reset":
+                venv.reset()
+                conn.send(None)
+            elif cmd == "close":
+                break
+        del obs, rewards, actions, dones, venv
+    finally:
+        conn.close()
+        shm.close()
+
+
+class SubprocVecEnvironment:
+    def __init__(self, all_cooked_time, all_cooked_bw, num_envs=1, num_workers=1,
+                 random_seed=RANDOM_SEED):
+        """
+        Mesma interface do VecEnvironment, com os sub-ambientes divididos
+        entre num_workers processos. Pelos pipes só trafegam comandos e infos.
+        """
+        self.num_envs = num_envs
+        self.shm = shared_memory.SharedMemory(create=True, size=_buffers_size(num_envs))
+        self.obs, self.rewards, self.actions, self.dones = _buffers(self.shm, num_envs)
+
+        self.conns = []
+        self.processes = []
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if lo == hi:
+                continue
+            parent_conn, child_conn = Pipe()
+            p = Process(target=_worker, daemon=True,
+                        args=(child_conn, self.shm.name, num_envs, lo, hi,
+                              all_cooked_time, all_cooked_bw, random_seed))
+            p.start()
+            child_conn.close()
+            self.conns.append(parent_conn)
+            self.processes.append(p)
+
+    def reset(self):
+        for conn in self.conns:
+            conn.send("reset")
+        for conn in self.conns:
+            conn.recv()
+        return self.obs
+
+    def step(self, actions):
+        self.actions[:] = actions
+        for conn in self.conns:
+            conn.send("step")
+        infos = []
+        for conn in self.conns:
+            infos.extend(conn.recv())
+        return self.obs, self.rewards, self.dones, infos
+
+    def close(self):
+        for conn in self.conns:
+            conn.send("close")
+            conn.close()
+        for p in self.processes:
+            p.join()
+        del self.obs, self.rewards, self.actions, self.dones
+        self.shm.close()
+        self.shm.unlink()